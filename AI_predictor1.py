@@ -1,21 +1,108 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+
 import numpy as np
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# pandas, scikit-learn, joblib and matplotlib are imported where they are first
+# used, so a process that only loads a saved model and predicts never pays for
+# pandas or matplotlib
+
+FINGER_TYPES = ('little', 'thumb')
+
+# Readings per scaler.transform/model.predict call in predict_glucose_batch
+DEFAULT_CHUNK_SIZE = 65536
+
+MODEL_FORMAT = "ai-ninjas-glucose-model"
+MODEL_FORMAT_VERSION = 1
+DEFAULT_MODEL_PATH = "glucose_model.joblib"
+
+# Cross-validation in train_model: folds scored before pruning starts, and how far
+# behind the leader's mean R² a candidate may fall before it is abandoned
+DEFAULT_FOLDS = 3
+MIN_FOLDS_BEFORE_PRUNING = 2
+PRUNE_MARGIN = 0.25
+
 
-from sklearn.preprocessing import StandardScaler
+def _evaluate_fold(model, sizes, X, y, train_index, test_index):
+    """Fit a copy of model on one fold; return (R², RMSE, MAE, fit seconds) for each of sizes.
+
+    sizes are the estimator counts to score from the one fit, the largest
+    being the model's own n_estimators, or [None] to score the model as is.
+    """
+    from sklearn.base import clone
+    
+    start = time.perf_counter()
+    model = clone(model).fit(X[train_index], y[train_index])
+    seconds = time.perf_counter() - start
+    y_test = y[test_index]
+    # The metrics in NumPy: sklearn.metrics validates its inputs on every call, which costs more
+    # than the arithmetic at these sizes. A constant fold scores R² as r2_score does
+    total = np.sum((y_test - y_test.mean()) ** 2)
+    scores = []
+    for y_pred in _predictions_by_size(model, X[test_index], sizes):
+        errors = y_test - y_pred
+        residual = np.sum(errors ** 2)
+        r2 = 1 - residual / total if total else float(residual == 0)
+        scores.append((r2, np.sqrt(residual / len(errors)), np.mean(np.abs(errors)), seconds))
+    return scores
+
+def _predictions_by_size(model, X, sizes):
+    """Predictions of a fitted model cut down to each of sizes estimators, in order"""
+    if sizes == [None]:
+        return [model.predict(X)]
+    if hasattr(model, 'staged_predict'):
+        # Boosting stage n predicts what a model of n stages would
+        staged = list(model.staged_predict(X))
+        return [staged[size - 1] for size in sizes]
+    # A forest predicts the mean of its trees, and its first n trees are the ones an
+    # n-tree forest with the same random_state grows
+    cumulative = np.cumsum([tree.predict(X) for tree in model.estimators_], axis=0)
+    return [cumulative[size - 1] / size for size in sizes]
+
+def _size_groups(candidates, names):
+    """(model, sizes, names) for each group of the named candidates differing only in n_estimators.
+
+    model is the group's largest candidate, and sizes and names run from
+    smallest to largest; candidates without n_estimators form their own group.
+    """
+    groups = {}
+    for name in names:
+        params = candidates[name].get_params()
+        size = params.pop('n_estimators', None)
+        key = name if size is None else (type(candidates[name]), repr(sorted(params.items())))
+        groups.setdefault(key, []).append((size, name))
+    result = []
+    for members in groups.values():
+        members.sort(key=lambda member: member[0] or 0)
+        sizes, group_names = (list(values) for values in zip(*members))
+        result.append((candidates[group_names[-1]], sizes, group_names))
+    return result
 
 class GlucosePredictor:
-    def __init__(self):
+    def __init__(self, finger_type=None):
+        # Train on one finger's readings only; None uses both
+        if finger_type is not None and finger_type not in FINGER_TYPES:
+            raise ValueError(f"Unknown finger type: {finger_type}")
+        self.finger_type = finger_type
         self.model = None
-        self.scaler = StandardScaler()
+        # Fitted StandardScaler, set by train_model or load_model
+        self.scaler = None
         self.is_trained = False
-        
-    def prepare_data(self):
-        """Prepare the training dataset"""
+        self.model_name = None
+        self.metrics = {}
+        self.data_hash = None
+        # scikit-learn version the loaded artifact was saved with
+        self.sklearn_version = None
+        # UserCalibration with per-user corrections over this model, created by the first calibrate call
+        self.calibration = None
+        
+    def training_data(self):
+        """Training dataset as plain column lists"""
         # Little finger data
         little_finger_readings = [163.5,166.5,162.5,164.5,160.5,165.5,164.5,164.5,164.5,166.5,
                                 169.5,180.5,166.5,164.5,164.5,165.5,166.5,166.5,163.4,166.5]
@@ -33,17 +120,66 @@ class GlucosePredictor:
         all_glucose = little_finger_glucose + thumb_glucose
         finger_type = ['little'] * len(little_finger_readings) + ['thumb'] * len(thumb_readings)
         
-        # Create DataFrame
-        df = pd.DataFrame({
+        data = {
             'sensor_reading': all_readings,
             'glucose_level': all_glucose,
             'finger_type': finger_type
-        })
+        }
+        if self.finger_type is not None:
+            keep = [i for i, finger in enumerate(finger_type) if finger == self.finger_type]
+            data = {column: [values[i] for i in keep] for column, values in data.items()}
+        return data
+    
+    def prepare_data(self):
+        """Prepare the training dataset"""
+        import pandas as pd
         
-        return df
+        # Create DataFrame
+        return pd.DataFrame(self.training_data())
+    
+    def training_data_hash(self):
+        """SHA-256 of the training data, used to spot stale model artifacts"""
+        data = json.dumps(self.training_data(), sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
     
-    def train_model(self):
-        """Train the machine learning model"""
+    def candidate_models(self):
+        """Model candidates compared by train_model, by display name"""
+        from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+        from sklearn.linear_model import LinearRegression, Ridge
+        
+        candidates = {}
+        # Candidates differing only in n_estimators are scored from one fit of the largest per
+        # fold, so each estimator count costs no more fitting than the largest. Fits of every size
+        # here are dominated by per-estimator overhead, and on this data 5 or 10 trees and 25
+        # boosting stages cross-validate as well as 100 of either
+        for max_depth in (3, None):
+            for n_estimators in (5, 10):
+                candidates[f'Random Forest ({n_estimators} trees, depth {max_depth or "unlimited"})'] = \
+                    RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=42)
+        candidates['Linear Regression'] = LinearRegression()
+        for alpha in (0.1, 1.0, 10.0):
+            candidates[f'Ridge (alpha={alpha})'] = Ridge(alpha=alpha)
+        for n_estimators in (10, 25):
+            candidates[f'Gradient Boosting ({n_estimators} stages, learning rate 0.1)'] = GradientBoostingRegressor(
+                n_estimators=n_estimators, learning_rate=0.1, max_depth=2, random_state=42)
+        return candidates
+    
+    def train_model(self, plot=True, folds=DEFAULT_FOLDS, n_jobs=None):
+        """Train the machine learning model; plot=False skips the results plot for headless runs.
+
+        Every candidate from candidate_models is scored by k-fold
+        cross-validation, one fold per round. After MIN_FOLDS_BEFORE_PRUNING
+        rounds, candidates whose mean R² trails the leader by more than
+        PRUNE_MARGIN are dropped. Candidates differing only in n_estimators
+        share one fit per fold, and the reported fit time is that shared
+        fit's. With n_jobs, each round's fits run in a pool of that many
+        processes, one per CPU for -1; the default fits in this process. The
+        winner is refitted on all the data.
+        """
+        from sklearn.base import clone
+        from sklearn.model_selection import KFold
+        from sklearn.preprocessing import StandardScaler
+        
         # Prepare data
         df = self.prepare_data()
         
@@ -52,55 +188,156 @@ class GlucosePredictor:
         y = df['glucose_level'].values
         
         # Scale features
+        self.scaler = StandardScaler()
         X_scaled = self.scaler.fit_transform(X)
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X_scaled, y, test_size=0.2, random_state=42
-        )
+        candidates = self.candidate_models()
+        splits = list(KFold(n_splits=folds, shuffle=True, random_state=42).split(X_scaled))
+        results = {name: [] for name in candidates}
+        active = list(candidates)
+        abandoned = {}
         
-        # Train multiple models
-        models = {
-            'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42),
-            'Linear Regression': LinearRegression()
-        }
-        
-        best_model = None
-        best_score = -np.inf
-        best_model_name = ""
-        
-        print("Training models...")
+        print(f"Training {len(candidates)} models in {len(_size_groups(candidates, active))} fits per fold "
+              f"with {folds}-fold cross-validation...")
         print("=" * 50)
         
-        for name, model in models.items():
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            score = r2_score(y_test, y_pred)
-            
+        workers = (os.cpu_count() or 1) if n_jobs == -1 else (n_jobs or 1)
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(candidates))) if workers > 1 else None
+        try:
+            for fold, (train_index, test_index) in enumerate(splits):
+                groups = _size_groups(candidates, active)
+                args = [(model, sizes, X_scaled, y, train_index, test_index) for model, sizes, _ in groups]
+                if pool:
+                    scores = list(pool.map(_evaluate_fold, *zip(*args)))
+                else:
+                    scores = [_evaluate_fold(*arg) for arg in args]
+                for (_, _, names), group_scores in zip(groups, scores):
+                    for name, score in zip(names, group_scores):
+                        results[name].append(score)
+                
+                if fold + 1 >= MIN_FOLDS_BEFORE_PRUNING and fold + 1 < folds:
+                    means = {name: np.mean([r2 for r2, _, _, _ in results[name]]) for name in active}
+                    leader = max(means.values())
+                    for name in active:
+                        if means[name] < leader - PRUNE_MARGIN:
+                            abandoned[name] = fold + 1
+                    active = [name for name in active if name not in abandoned]
+        finally:
+            if pool:
+                pool.shutdown()
+        
+        summary = {}
+        for name, scores in results.items():
+            r2, rmse, mae, seconds = np.array(scores).T
+            summary[name] = {'r2': float(r2.mean()), 'r2_std': float(r2.std()), 'rmse': float(rmse.mean()),
+                             'mae': float(mae.mean()), 'folds': len(scores), 'fit_seconds': float(seconds.sum())}
+        
+        for name, metrics in sorted(summary.items(), key=lambda item: -item[1]['r2']):
             print(f"{name}:")
-            print(f"  R² Score: {score:.4f}")
-            print(f"  RMSE: {np.sqrt(mean_squared_error(y_test, y_pred)):.2f}")
-            print(f"  MAE: {mean_absolute_error(y_test, y_pred):.2f}")
+            print(f"  R² Score: {metrics['r2']:.4f} ± {metrics['r2_std']:.4f}")
+            print(f"  RMSE: {metrics['rmse']:.2f}")
+            print(f"  MAE: {metrics['mae']:.2f}")
+            print(f"  Fit time: {metrics['fit_seconds'] * 1000:.0f} ms over {metrics['folds']} folds"
+                  + (f" (abandoned after {abandoned[name]})" if name in abandoned else ""))
             print("-" * 30)
-            
-            if score > best_score:
-                best_score = score
-                best_model = model
-                best_model_name = name
         
-        self.model = best_model
+        best_model_name = max(active, key=lambda name: summary[name]['r2'])
+        best_score = summary[best_model_name]['r2']
+        
+        self.model = clone(candidates[best_model_name]).fit(X_scaled, y)
         self.is_trained = True
+        self.model_name = best_model_name
+        self.metrics = summary[best_model_name]
+        self.data_hash = self.training_data_hash()
         
         print(f"Selected best model: {best_model_name}")
         print(f"Best R² Score: {best_score:.4f}")
         
         # Plot the results
-        self.plot_results(df)
+        if plot:
+            self.plot_results(df)
         
         return best_score
     
-    def predict_glucose(self, sensor_reading, finger_type='little'):
-        """Predict glucose level from sensor reading"""
+    def save_model(self, path=DEFAULT_MODEL_PATH):
+        """Write the trained model, scaler, model name and metrics as a versioned artifact"""
+        if not self.is_trained:
+            raise ValueError("Model must be trained before it can be saved")
+        
+        import joblib
+        import sklearn
+        
+        artifact = {
+            'format': MODEL_FORMAT,
+            'format_version': MODEL_FORMAT_VERSION,
+            'sklearn_version': sklearn.__version__,
+            'data_hash': self.data_hash,
+            'finger_type': self.finger_type,
+            'model_name': self.model_name,
+            'metrics': self.metrics,
+            'model': self.model,
+            'scaler': self.scaler,
+        }
+        # Uncompressed so the arrays inside can be memory-mapped on load
+        joblib.dump(artifact, path)
+    
+    def load_model(self, path=DEFAULT_MODEL_PATH, mmap=False, check_data=True):
+        """Load an artifact written by save_model; return True if it matches the current training data.
+
+        The artifact's data hash is compared with training_data_hash(),
+        which rebuilds the built-in training set; check_data=False skips
+        that, for artifacts trained on other data, and returns None. An
+        artifact pickled by another scikit-learn version loads with a
+        warning, since its estimators may not behave the same. mmap=True
+        maps the tree arrays read-only instead of copying them, so
+        processes loading the same file share its pages; for a small forest
+        the per-array mapping makes the load itself slower.
+        """
+        import joblib
+        import sklearn
+        
+        artifact = joblib.load(path, mmap_mode='r' if mmap else None)
+        if (not isinstance(artifact, dict) or artifact.get('format') != MODEL_FORMAT
+                or artifact.get('format_version') != MODEL_FORMAT_VERSION):
+            raise ValueError(f"{path} is not a version {MODEL_FORMAT_VERSION} glucose model")
+        
+        self.model = artifact['model']
+        self.scaler = artifact['scaler']
+        self.model_name = artifact['model_name']
+        self.metrics = artifact['metrics']
+        self.data_hash = artifact['data_hash']
+        self.finger_type = artifact.get('finger_type')
+        self.sklearn_version = artifact.get('sklearn_version')
+        self.is_trained = True
+        if self.sklearn_version != sklearn.__version__:
+            warnings.warn(f"{path} was saved with scikit-learn {self.sklearn_version} but "
+                          f"{sklearn.__version__} is installed; retrain it if predictions look wrong")
+        if not check_data:
+            return None
+        return self.data_hash == self.training_data_hash()
+    
+    def export_compiled(self, path):
+        """Write the model as plain arrays for compiled_model.CompiledModel, which runs without scikit-learn"""
+        from compiled_model import save_compiled
+        
+        save_compiled(self, path)
+    
+    def load_or_train(self, path=DEFAULT_MODEL_PATH, retrain=False, plot=True, n_jobs=None):
+        """Load the saved model, training and saving a new one only if asked or none exists"""
+        if not retrain and os.path.exists(path):
+            start = time.perf_counter()
+            fresh = self.load_model(path)
+            print(f"Loaded {self.model_name} from {path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+            if not fresh:
+                print("⚠️  The training data has changed since this model was saved; run with --retrain to refit it")
+            return
+        
+        self.train_model(plot=plot, n_jobs=n_jobs)
+        self.save_model(path)
+        print(f"Saved model to {path}")
+    
+    def predict_glucose(self, sensor_reading, finger_type='little', user_id=None):
+        """Predict glucose level from sensor reading, with the user's calibration if they have one"""
         if not self.is_trained:
             raise ValueError("Model must be trained before making predictions")
         
@@ -110,11 +347,82 @@ class GlucosePredictor:
         
         # Make prediction
         prediction = self.model.predict(reading_scaled)[0]
+        if user_id is not None and self.calibration is not None:
+            prediction += self.calibration.correction(user_id, sensor_reading)
         
         return round(prediction, 1)
     
+    def calibrate(self, user_id, sensor_reading, reference_glucose):
+        """Fold one (sensor reading, reference glucose) pair into the user's calibration.
+
+        Only the user's running residual against the current model is
+        updated; the model itself is not refitted. Corrections are relative
+        to this model, so reset self.calibration after retraining.
+        """
+        self.calibrate_batch([user_id], [sensor_reading], [reference_glucose])
+    
+    def calibrate_batch(self, user_ids, sensor_readings, reference_glucose):
+        """Fold many calibration pairs in, in order, with one batched base prediction"""
+        from calibration import UserCalibration
+        
+        readings = np.asarray(sensor_readings, dtype=np.float64).reshape(-1)
+        residuals = np.asarray(reference_glucose, dtype=np.float64).reshape(-1) - self.predict_glucose_batch(readings)
+        if self.calibration is None:
+            self.calibration = UserCalibration()
+        for user_id, reading, residual in zip(user_ids, readings.tolist(), residuals.tolist()):
+            self.calibration.update(user_id, reading, residual)
+    
+    def predict_glucose_batch(self, sensor_readings, finger_types='little',
+                              chunk_size=DEFAULT_CHUNK_SIZE, n_jobs=None, user_ids=None):
+        """Predict glucose levels for an array or Series of sensor readings.
+
+        finger_types is one finger type for every reading or one per reading.
+        Readings are scaled and predicted a chunk at a time; with n_jobs,
+        chunks run on that many threads. user_ids, one per reading, adds
+        each user's calibration. Returns an unrounded float32 array.
+        """
+        if not self.is_trained:
+            raise ValueError("Model must be trained before making predictions")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        
+        readings = np.asarray(sensor_readings, dtype=np.float64).reshape(-1)
+        
+        # The model is trained on the reading alone; finger types are only validated
+        fingers = np.asarray(finger_types, dtype=object).reshape(-1)
+        if len(fingers) not in (1, len(readings)):
+            raise ValueError(f"Got {len(fingers)} finger types for {len(readings)} readings")
+        unknown = set(fingers.tolist()) - set(FINGER_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown finger type: {sorted(map(str, unknown))[0]}")
+        
+        predictions = np.empty(len(readings), dtype=np.float32)
+        
+        def predict_chunk(start):
+            chunk = readings[start:start + chunk_size].reshape(-1, 1)
+            predictions[start:start + len(chunk)] = self.model.predict(self.scaler.transform(chunk))
+        
+        starts = range(0, len(readings), chunk_size)
+        if n_jobs and n_jobs > 1 and len(starts) > 1:
+            # Tree and linear predictions release the GIL, so threads scale
+            with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                list(pool.map(predict_chunk, starts))
+        else:
+            for start in starts:
+                predict_chunk(start)
+        
+        if user_ids is not None and self.calibration is not None:
+            rows = self.calibration.rows_for(user_ids)
+            if len(rows) != len(readings):
+                raise ValueError(f"Got {len(rows)} user ids for {len(readings)} readings")
+            predictions += self.calibration.corrections(rows, readings).astype(np.float32)
+        
+        return predictions
+    
     def plot_results(self, df):
         """Plot the training results and regression line"""
+        import matplotlib.pyplot as plt
+        
         X = df[['sensor_reading']].values
         X_scaled = self.scaler.transform(X)
         y_pred = self.model.predict(X_scaled)
@@ -267,13 +575,22 @@ class GlucosePredictor:
 # Main execution
 def main():
     """Main function to run the glucose prediction system"""
+    parser = argparse.ArgumentParser(description="IR sensor glucose prediction")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="saved model artifact to load or create")
+    parser.add_argument("--retrain", action="store_true", help="refit the models and overwrite the artifact")
+    parser.add_argument("--headless", action="store_true", help="never open the training results plot")
+    parser.add_argument("--n-jobs", type=int, default=None,
+                        help="processes for cross-validation fits when training; -1 for one per CPU")
+    args = parser.parse_args()
+    
     try:
         # Create predictor instance
         predictor = GlucosePredictor()
         
-        # Train the model
+        # Load the saved model, or train and save one
         print("Initializing Glucose Prediction System...")
-        predictor.train_model()
+        predictor.load_or_train(args.model, retrain=args.retrain, plot=not args.headless,
+                                n_jobs=args.n_jobs)
         
         # Start interactive prediction
         predictor.interactive_prediction()
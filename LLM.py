@@ -1,11 +1,26 @@
-import re
-import pandas as pd
-import matplotlib.pyplot as plt
+import copy
 from collections import defaultdict
 import datetime
 
+import numpy as np
+
+from coaching_rules import HBA1C_BANDS, HEALTH_RULES, REPLACEMENT_RULES
+from food_parser import FoodMatcher
+from food_store import FoodStore, SharedFoodStore
+from intent_router import IntentRouter
+from nutrient_matrix import NutrientMatrix
+from parse_cache import LRUCache, VersionedTable
+from responses import MealResponse, MessageResponse
+
 class HealthFoodAdvisor:
-    def __init__(self):
+    # Vocabulary tables; any change to them invalidates the matcher and parse cache
+    food_database = VersionedTable()
+    synonyms = VersionedTable()
+    units = VersionedTable()
+    meal_patterns = VersionedTable()
+    
+    def __init__(self, parse_cache_size=1024, fuzzy_threshold=0.55, food_store=None, ir_stream=None,
+                 meal_history=None, user_id="default", rollups=None):
         # User profile
         self.user_profile = {
             "name": "",
@@ -92,6 +107,20 @@ class HealthFoodAdvisor:
             "soda": {"calories": 150, "carbs": 40, "protein": 0, "fat": 0, "category": "beverage"},
         }
         
+        # A memory-mapped or shared store (path, FoodStore or SharedFoodStore) replaces the built-in foods without loading them
+        if food_store is not None:
+            self.food_database = food_store if isinstance(food_store, FoodStore) else FoodStore(food_store)
+        
+        # Running IRStreamPipeline whose latest window answers glucose questions
+        self.ir_stream = ir_stream
+        
+        # MealHistory that every processed meal is appended to, under user_id
+        self.meal_history = meal_history
+        self.user_id = user_id
+        
+        # NutritionRollups kept current with every meal logged or retracted
+        self.rollups = rollups
+        
         # Common synonyms and variations
         self.synonyms = {
             "idly": "idli", "idlis": "idli",
@@ -122,6 +151,11 @@ class HealthFoodAdvisor:
             "slice": 0.5, "slices": 0.5
         }
         
+        # A shared table carries the canonical synonyms and units along with its foods
+        if isinstance(self.food_database, SharedFoodStore):
+            self.synonyms = self.food_database.synonyms
+            self.units = self.food_database.units
+        
         # Meal time patterns
         self.meal_patterns = {
             "breakfast": ["breakfast", "morning", "first meal", "early meal"],
@@ -146,6 +180,42 @@ class HealthFoodAdvisor:
         # Salad additions
         self.salad_additions = ["spinach", "cabbage", "carrot", "broccoli", "cauliflower", "cucumber", "tomato", "bell pepper"]
         
+        # Parse results (meal type and food quantities) keyed on normalized message text
+        self.parse_cache = LRUCache(parse_cache_size)
+        
+        # Minimum n-gram similarity for a misspelled word to count as a food
+        self.fuzzy_threshold = fuzzy_threshold
+        
+        # Matcher and nutrient matrix, built once so per-message cost doesn't grow with the vocabulary
+        self.rebuild_lookups()
+        
+    def vocabulary_version(self):
+        """Versions of food_database, synonyms, units and meal_patterns; changes whenever one of them does"""
+        return (self.food_database.version, self.synonyms.version,
+                self.units.version, self.meal_patterns.version)
+    
+    def rebuild_lookups(self):
+        """Rebuild the food matcher, nutrient matrix and intent router and drop cached parses for the current tables"""
+        self.food_matcher = FoodMatcher(self.food_database, self.synonyms, self.units, self.fuzzy_threshold)
+        self.nutrient_matrix = NutrientMatrix(self.food_database)
+        self.intent_router = IntentRouter(self.meal_patterns)
+        self.parse_cache.clear()
+        self._built_version = self.vocabulary_version()
+    
+    def _refresh_vocabulary(self):
+        """Rebuild derived lookups if food_database, synonyms, units or meal_patterns changed"""
+        if self.vocabulary_version() != self._built_version:
+            self.rebuild_lookups()
+    
+    def with_profile(self, profile, user_id=None):
+        """Return an advisor that shares this one's tables and caches but reads and updates another user profile"""
+        self._refresh_vocabulary()
+        advisor = copy.copy(self)
+        advisor.user_profile = profile
+        if user_id is not None:
+            advisor.user_id = user_id
+        return advisor
+    
     def set_user_profile(self, name, age, weight_kg, height_cm, hba1c):
         """Set up user profile and calculate daily calorie target based on HbA1c"""
         self.user_profile["name"] = name
@@ -164,19 +234,16 @@ class HealthFoodAdvisor:
             if age > 60:
                 bmr -= 5  # Adjustment for seniors
         
-        # Adjust calorie target based on HbA1c level
-        if hba1c < 5.7:
-            # Normal HbA1c
-            self.user_profile["daily_calorie_target"] = bmr * 1.2  # Sedentary lifestyle
-        elif 5.7 <= hba1c <= 6.4:
-            # Prediabetes
-            self.user_profile["daily_calorie_target"] = bmr * 1.1  # Slightly reduced
-        else:
-            # Diabetes
-            self.user_profile["daily_calorie_target"] = bmr  # Further reduced for better control
+        # Adjust calorie target based on HbA1c level: reduced for prediabetes, further for diabetes
+        band = HBA1C_BANDS.evaluate_one({"hba1c": hba1c})
+        self.user_profile["daily_calorie_target"] = bmr * band["bmr_multiplier"]
     
     def get_ir_sensor_reading(self):
-        """Simulate IR sensor reading for glucose monitoring"""
+        """Latest glucose estimate from the IR stream, or a simulated reading without one"""
+        latest = self.ir_stream.latest if self.ir_stream is not None else None
+        if latest is not None and latest.glucose == latest.glucose:
+            return round(latest.glucose)
+        
         # In a real application, this would interface with actual hardware
         import random
         return random.randint(70, 200)  # Simulated glucose reading
@@ -193,142 +260,127 @@ class HealthFoodAdvisor:
     
     def extract_meal_type(self, user_input):
         """Extract meal type from natural language input"""
-        text = user_input.lower()
-        
-        for meal_type, patterns in self.meal_patterns.items():
-            for pattern in patterns:
-                if pattern in text:
-                    return meal_type
-        
-        # If no specific meal type found, try to infer from context
-        if "morning" in text or "first" in text:
-            return "breakfast"
-        elif "afternoon" in text or "midday" in text:
-            return "lunch"
-        elif "evening" in text or "night" in text:
-            return "dinner"
-        elif "snack" in text or "munch" in text:
-            return "snacks"
-            
-        return None
+        self._refresh_vocabulary()
+        return self.intent_router.meal_type(user_input.lower())
     
     def extract_food_items(self, user_input):
         """Extract food items and quantities from natural language input"""
+        self._refresh_vocabulary()
+        
         # Convert to lowercase for easier processing
         text = user_input.lower()
         
-        # Replace synonyms with standard names
-        for synonym, standard in self.synonyms.items():
-            text = re.sub(r'\b' + synonym + r'\b', standard, text)
-        
-        # Find all mentioned food items
-        found_items = []
-        for food in self.food_database:
-            if re.search(r'\b' + food + r'\b', text):
-                found_items.append(food)
+        # Find foods with their quantities and units in one pass
+        items = self.food_matcher.parse(text)
         
-        # If no direct matches, try partial matches
-        if not found_items:
-            for food in self.food_database:
-                if any(word in text.split() for word in food.split()):
-                    found_items.append(food)
+        # If no direct matches, try partial and misspelled food names
+        if not items:
+            items = self.food_matcher.parse(text, fuzzy=True)
         
-        # Extract quantities
+        # Sum servings per food, ignoring synonyms of foods we have no data for
         food_quantities = {}
-        for food in found_items:
-            # Look for quantity patterns before the food name
-            pattern = r'(\d+)\s*(' + '|'.join(self.units.keys()) + r')?\s*' + food
-            match = re.search(pattern, text)
-            
-            if match:
-                quantity = int(match.group(1))
-                unit = match.group(2) if match.group(2) else "piece"
-                multiplier = self.units.get(unit, 1)
-                food_quantities[food] = quantity * multiplier
-            else:
-                # Check for vague quantity descriptions
-                if "some" in text or "a little" in text or "bit of" in text:
-                    food_quantities[food] = 0.5
-                elif "a lot of" in text or "plenty of" in text:
-                    food_quantities[food] = 2
-                else:
-                    # Default to 1 serving if no quantity specified
-                    food_quantities[food] = 1
+        for item in items:
+            if item.food in self.food_database:
+                food_quantities[item.food] = food_quantities.get(item.food, 0) + item.servings
         
         return food_quantities
     
-    def calculate_nutrition(self, food_quantities):
+    def parse_meal(self, user_input):
+        """Return (meal_type, food_quantities) for a message, cached on its normalized text"""
+        self._refresh_vocabulary()
+        
+        key = " ".join(user_input.lower().split())
+        parsed = self.parse_cache.get(key)
+        if parsed is None:
+            meal_type = self.extract_meal_type(key)
+            food_quantities = self.extract_food_items(key) if meal_type else {}
+            parsed = (meal_type, food_quantities)
+            self.parse_cache.put(key, parsed)
+        
+        # Hand out a copy so callers can't alter the cached entry
+        meal_type, food_quantities = parsed
+        return meal_type, dict(food_quantities)
+    
+    def calculate_nutrition(self, food_quantities, include_breakdown=True):
         """Calculate nutritional information based on food quantities"""
-        total_nutrition = defaultdict(float)
-        breakdown = {}
+        self._refresh_vocabulary()
         
-        for food, quantity in food_quantities.items():
-            if food in self.food_database:
-                nutrition = self.food_database[food]
-                breakdown[food] = {
-                    "quantity": quantity,
-                    "calories": nutrition["calories"] * quantity,
-                    "carbs": nutrition["carbs"] * quantity,
-                    "protein": nutrition["protein"] * quantity,
-                    "fat": nutrition["fat"] * quantity
-                }
-                
-                total_nutrition["calories"] += breakdown[food]["calories"]
-                total_nutrition["carbs"] += breakdown[food]["carbs"]
-                total_nutrition["protein"] += breakdown[food]["protein"]
-                total_nutrition["fat"] += breakdown[food]["fat"]
+        breakdown = {}
+        if include_breakdown:
+            # Per-food breakdown for callers that display or store it, from the nutrient matrix rows, with
+            # the totals as its sum; editing a food's dict in place changes neither until it is assigned again
+            total_calories = total_carbs = total_protein = total_fat = 0.0
+            for food, quantity in food_quantities.items():
+                values = self.nutrient_matrix.food_values(food)
+                if values is not None:
+                    calories, carbs, protein, fat = values
+                    breakdown[food] = {
+                        "quantity": quantity,
+                        "calories": calories * quantity,
+                        "carbs": carbs * quantity,
+                        "protein": protein * quantity,
+                        "fat": fat * quantity
+                    }
+                    total_calories += calories * quantity
+                    total_carbs += carbs * quantity
+                    total_protein += protein * quantity
+                    total_fat += fat * quantity
+            totals = (total_calories, total_carbs, total_protein, total_fat)
+        else:
+            # One quantity-vector product against the nutrient matrix
+            totals = self.nutrient_matrix.totals(food_quantities).tolist()
+        total_nutrition = defaultdict(float, zip(self.nutrient_matrix.nutrients, totals))
         
         return total_nutrition, breakdown
     
+    def calculate_batch_nutrition(self, meals):
+        """Nutrient totals for a sequence of food_quantities dicts as an (n_meals, 4) array"""
+        self._refresh_vocabulary()
+        return self.nutrient_matrix.batch_totals(meals)
+    
+    def _coaching_constants(self):
+        return {
+            "protein_alternatives": self.protein_alternatives,
+            "salad_additions": self.salad_additions,
+            "replacement_suggestions": self.replacement_suggestions,
+        }
+    
     def get_meal_replacement_suggestions(self, food_quantities):
         """Generate meal replacement suggestions focusing on protein for carbs and salad additions"""
-        suggestions = []
-        
-        # Check for high-carb foods and suggest protein alternatives
-        high_carb_foods = ["rice", "pasta", "bread", "potato", "noodles"]
-        for food in food_quantities:
-            if food in high_carb_foods:
-                # Suggest reducing portion and adding protein
-                suggestions.append(f"Consider reducing {food} portion and adding {self.protein_alternatives[0]} or {self.protein_alternatives[1]} for better protein balance.")
-                
-                # Suggest specific alternatives
-                if food in self.replacement_suggestions:
-                    alternatives = self.replacement_suggestions[food]
-                    suggestions.append(f"You could replace {food} with {alternatives[0]} or {alternatives[1]} for a healthier option.")
-        
-        # Check if meal lacks vegetables/salad
-        vegetable_count = sum(1 for food in food_quantities if self.food_database[food]["category"] in ["vegetable"])
-        if vegetable_count < 2:
-            suggestions.append(f"Consider adding a salad with {self.salad_additions[0]}, {self.salad_additions[1]}, and {self.salad_additions[2]} for more fiber and nutrients.")
-        
-        # Check protein content
-        protein_foods = [food for food in food_quantities if self.food_database[food]["category"] == "protein"]
-        if not protein_foods:
-            suggestions.append(f"Your meal could use more protein. Consider adding {self.protein_alternatives[0]}, {self.protein_alternatives[1]}, or {self.protein_alternatives[2]}.")
-        
-        return suggestions
+        categories = [self.food_database[food]["category"] for food in food_quantities]
+        counts = {"vegetable_foods": categories.count("vegetable"), "protein_foods": categories.count("protein")}
+        return REPLACEMENT_RULES.evaluate_one(counts, food_quantities, self._coaching_constants())["suggestions"]
     
     def get_health_suggestions(self, nutrition_info, meal_type):
         """Generate health suggestions based on meal content and user profile"""
-        suggestions = []
-        
-        # Check carbohydrate content for diabetic users
-        if self.user_profile["hba1c"] >= 5.7 and nutrition_info["carbs"] > 30:
-            suggestions.append("Your meal is high in carbohydrates. Consider replacing some carbs with protein or vegetables.")
-        
-        # Check if meal is too high in calories
-        remaining_calories = self.user_profile["daily_calorie_target"] - self.user_profile["calories_consumed"]
-        if nutrition_info["calories"] > remaining_calories * 0.5:
-            suggestions.append("This meal is quite calorie-dense. You might want to consider a lighter option.")
-        
-        # General health suggestions
-        if self.user_profile["steps_today"] < 5000:
-            suggestions.append("You haven't reached your step goal today. Try to take a walk after your meal.")
-        
-        if len(suggestions) == 0:
-            suggestions.append("Your meal looks balanced. Keep up the good eating habits!")
-        
-        return suggestions
+        # user_profile may be a dict or a profile_store.UserProfile, which is indexable but not a mapping
+        profile = {field: self.user_profile[field] for field in
+                   ("hba1c", "daily_calorie_target", "calories_consumed", "steps_today")}
+        return HEALTH_RULES.evaluate_one({**profile, **nutrition_info})["suggestions"]
+    
+    def batch_replacement_suggestions(self, meals):
+        """get_meal_replacement_suggestions for a sequence of food_quantities dicts, one list per meal"""
+        foods = [list(food_quantities) for food_quantities in meals]
+        flat = [food for row in foods for food in row]
+        # Look up each distinct food's category once, then count per meal
+        categories = {food: self.food_database[food]["category"] for food in set(flat)}
+        category = np.array([categories[food] for food in flat], dtype=object)
+        row_of = np.repeat(np.arange(len(foods)), [len(row) for row in foods])
+        columns = {
+            "vegetable_foods": np.bincount(row_of[category == "vegetable"], minlength=len(foods)),
+            "protein_foods": np.bincount(row_of[category == "protein"], minlength=len(foods)),
+        }
+        return REPLACEMENT_RULES.evaluate(columns, foods, self._coaching_constants())["suggestions"]
+    
+    def batch_health_suggestions(self, frame):
+        """get_health_suggestions for every row of a DataFrame, one list per row.
+
+        frame has the meal's carbs and calories, and the user's hba1c,
+        daily_calorie_target, calories_consumed and steps_today.
+        """
+        columns = {name: frame[name].to_numpy() for name in
+                   ("carbs", "calories", "hba1c", "daily_calorie_target", "calories_consumed", "steps_today")}
+        return HEALTH_RULES.evaluate(columns)["suggestions"]
     
     def ask_about_previous_meals(self, current_meal):
         """Ask about previous meals based on the current meal"""
@@ -346,86 +398,94 @@ class HealthFoodAdvisor:
         return questions
     
     def process_meal(self, meal_type, food_quantities):
-        """Process a meal and update the user's calorie consumption"""
+        """Process a meal and update the user's calorie consumption; logging a meal again replaces it"""
         total_nutrition, breakdown = self.calculate_nutrition(food_quantities)
         
-        # Update meal record
-        self.user_profile["meals"][meal_type]["foods"] = breakdown
-        self.user_profile["meals"][meal_type]["calories"] = total_nutrition["calories"]
+        # Update meal record, replacing the earlier one's calories in the daily total
+        meal = self.user_profile["meals"][meal_type]
+        self.user_profile["calories_consumed"] += total_nutrition["calories"] - meal["calories"]
+        meal["foods"] = breakdown
+        meal["calories"] = total_nutrition["calories"]
         
-        # Update total calories consumed
-        self.user_profile["calories_consumed"] += total_nutrition["calories"]
+        # Both keep one meal per (user, day, meal type), replaced when it is logged again
+        day = datetime.date.today().isoformat()
+        meal_id = (self.user_id, day, meal_type)
+        if self.meal_history is not None:
+            self.meal_history.log_meal(self.user_id, meal_type, total_nutrition, food_quantities, meal_id=meal_id)
+        
+        if self.rollups is not None:
+            self.rollups.record(meal_id, self.user_id, day, meal_type, total_nutrition)
         
         return total_nutrition, breakdown
     
+    def retract_meal(self, meal_type):
+        """Remove a logged meal from today's record, the calories consumed, the meal history and the rollups"""
+        meal = self.user_profile["meals"][meal_type]
+        self.user_profile["calories_consumed"] -= meal["calories"]
+        meal["foods"] = {}
+        meal["calories"] = 0
+        
+        day = datetime.date.today().isoformat()
+        meal_id = (self.user_id, day, meal_type)
+        if self.meal_history is not None:
+            self.meal_history.retract_meal(meal_id)
+        
+        if self.rollups is not None:
+            self.rollups.retract(meal_id)
+    
     def get_remaining_calories(self):
         """Calculate remaining calories for the day"""
         return self.user_profile["daily_calorie_target"] - self.user_profile["calories_consumed"]
     
-    def generate_response(self, user_input):
-        """Generate a natural language response based on user input"""
+    def generate_response(self, user_input, parsed=None):
+        """Generate a response to user input.
+        
+        Returns an AdvisorResponse: str() renders it as text for the CLI and
+        to_dict()/to_json() give the structured values. parsed may carry the
+        result of parse_meal(user_input) computed elsewhere, for example in a
+        worker process.
+        """
+        # Classify the message once: glucose query, step update or meal log
+        self._refresh_vocabulary()
+        route = self.intent_router.route(user_input)
+        
         # Check if user is asking about IR sensor
-        if "sensor" in user_input.lower() or "glucose" in user_input.lower():
+        if route.intent == "glucose":
             reading = self.get_ir_sensor_reading()
             status = "normal" if 70 <= reading <= 140 else "high" if reading > 140 else "low"
-            return f"Your current glucose reading is {reading} mg/dL, which is {status}."
+            return MessageResponse("glucose", f"Your current glucose reading is {reading} mg/dL, which is {status}.",
+                                   reading=reading, status=status)
         
         # Check if user is providing step count
-        if "steps" in user_input.lower():
-            step_match = re.search(r'(\d+)\s*steps?', user_input.lower())
-            if step_match:
-                steps = int(step_match.group(1))
-                self.set_steps_count(steps)
-                return f"Thanks for updating your step count to {steps}. I've adjusted your calorie target accordingly."
+        if route.intent == "steps":
+            steps = route.steps
+            self.set_steps_count(steps)
+            return MessageResponse("steps", f"Thanks for updating your step count to {steps}. I've adjusted your calorie target accordingly.",
+                                   steps=steps, daily_calorie_target=self.user_profile["daily_calorie_target"])
         
-        # Extract meal type from input
-        meal_type = self.extract_meal_type(user_input)
+        # Extract meal type and food items from input
+        meal_type, food_quantities = parsed if parsed is not None else self.parse_meal(user_input)
         
         if not meal_type:
-            return "I'm not sure which meal you're referring to. Could you specify if this is breakfast, lunch, dinner, or a snack?"
-        
-        # Extract food items from input
-        food_quantities = self.extract_food_items(user_input)
+            return MessageResponse("clarify_meal", "I'm not sure which meal you're referring to. Could you specify if this is breakfast, lunch, dinner, or a snack?")
         
         if not food_quantities:
-            return "I couldn't identify any foods in your message. Could you please specify what you're planning to eat? For example, 'I'm having 2 dosas and a cup of coffee'."
+            return MessageResponse("clarify_foods", "I couldn't identify any foods in your message. Could you please specify what you're planning to eat? For example, 'I'm having 2 dosas and a cup of coffee'.")
         
         # Process the meal
         total_nutrition, breakdown = self.process_meal(meal_type, food_quantities)
-        remaining_calories = self.get_remaining_calories()
-        
-        # Generate response
-        response = f"Okay, I've recorded your {meal_type}:\n\n"
-        
-        for food, info in breakdown.items():
-            response += f"- {info['quantity']} serving(s) of {food}: {info['calories']} calories\n"
-        
-        response += f"\nTotal for this meal: {total_nutrition['calories']:.1f} calories\n"
-        response += f"Daily calorie target: {self.user_profile['daily_calorie_target']:.1f}\n"
-        response += f"Calories consumed today: {self.user_profile['calories_consumed']:.1f}\n"
-        response += f"Remaining calories: {remaining_calories:.1f}\n\n"
-        
-        # Add health suggestions
-        suggestions = self.get_health_suggestions(total_nutrition, meal_type)
-        response += "Health suggestions:\n"
-        for i, suggestion in enumerate(suggestions, 1):
-            response += f"{i}. {suggestion}\n"
-        
-        # Add meal replacement suggestions
-        replacement_suggestions = self.get_meal_replacement_suggestions(food_quantities)
-        if replacement_suggestions:
-            response += "\nMeal improvement suggestions:\n"
-            for i, suggestion in enumerate(replacement_suggestions, 1):
-                response += f"{i}. {suggestion}\n"
-        
-        # Ask about previous meals if needed
-        previous_meal_questions = self.ask_about_previous_meals(meal_type)
-        if previous_meal_questions:
-            response += "\nTo give you better advice, I need to know about your previous meals:\n"
-            for question in previous_meal_questions:
-                response += f"- {question}\n"
-        
-        return response
+        
+        return MealResponse(
+            meal_type=meal_type,
+            breakdown=breakdown,
+            totals=total_nutrition,
+            daily_calorie_target=self.user_profile["daily_calorie_target"],
+            calories_consumed=self.user_profile["calories_consumed"],
+            remaining_calories=self.get_remaining_calories(),
+            health_suggestions=self.get_health_suggestions(total_nutrition, meal_type),
+            replacement_suggestions=self.get_meal_replacement_suggestions(food_quantities),
+            follow_up_questions=self.ask_about_previous_meals(meal_type),
+        )
     
     def list_available_foods(self):
         """Return a list of all available foods in the database"""
@@ -473,7 +533,7 @@ def main():
             break
         
         response = advisor.generate_response(user_input)
-        print("\n" + response + "\n")
+        print("\n" + str(response) + "\n")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""Nightly coaching for a cohort: the batch rule evaluators against per-user calls.
+
+Builds one synthetic meal per user (nutrition, steps, HbA1c profile and
+foods) and times NutritionAdvisor.batch_recommendations and
+batch_meal_modifications, and HealthFoodAdvisor.batch_health_suggestions
+and batch_replacement_suggestions over the whole cohort. Per-user calls of
+the matching single-meal methods are timed on a sample and scaled up, and
+the sample's suggestions are checked to be identical. Run from the
+repository root:
+    python -m benchmarks.batch_coaching --users 300000
+"""
+import argparse
+import importlib.util
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from LLM import HealthFoodAdvisor
+
+HIGH_GI_FOODS = ["white bread", "white rice", "potato", "sugar"]
+
+
+def nutrition_advisor():
+    # code.py shares its name with the standard library module, so load it from its path
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code.py")
+    spec = importlib.util.spec_from_file_location("nutrition_code", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.NutritionAdvisor()
+
+
+def cohort(users, foods, seed=0):
+    """One meal per user as a DataFrame, its NutritionAdvisor foods and its HealthFoodAdvisor meals"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "protein": rng.uniform(0, 120, users).round(1),
+        "carbs": rng.uniform(0, 250, users).round(1),
+        "fat": rng.uniform(0, 40, users).round(1),
+        "glycemic_load": rng.uniform(0, 100, users).round(1),
+        "calories": rng.uniform(100, 1500, users).round(1),
+        "steps": rng.integers(0, 20000, users),
+        "hba1c": rng.uniform(4.5, 9, users).round(1),
+        "daily_calorie_target": rng.uniform(1400, 2600, users).round(1),
+        "calories_consumed": rng.uniform(0, 2000, users).round(1),
+    })
+    frame["steps_today"] = frame["steps"]
+    counts = rng.integers(1, 5, users)
+    gi_foods = [list(rng.choice(HIGH_GI_FOODS + ["apple", "salmon", "broccoli"], count)) for count in counts]
+    meals = [dict.fromkeys(rng.choice(foods, count, replace=False).tolist(), 1) for count in counts]
+    return frame, gi_foods, meals
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=300000)
+    parser.add_argument("--sample", type=int, default=20000, help="users timed with per-user calls")
+    args = parser.parse_args()
+
+    nutrition = nutrition_advisor()
+    health = HealthFoodAdvisor()
+    frame, gi_foods, meals = cohort(args.users, list(health.food_database))
+    records = frame.to_dict("records")
+    sample = range(min(args.sample, args.users))
+
+    def per_user_health(i):
+        health.user_profile.update({key: records[i][key] for key in
+                                    ("hba1c", "daily_calorie_target", "calories_consumed", "steps_today")})
+        return health.get_health_suggestions(records[i], "lunch")
+
+    def recommendations(i):
+        row = records[i]
+        return nutrition.calculate_recommendations(row, row["steps"], 0)
+
+    def batch_recommendations(result, i):
+        row = result.iloc[i]
+        groups = ("additions", "deletions", "replacements", "general")
+        return {group: row[group] for group in groups}, row["activity_level"]
+
+    cases = [
+        ("calculate_recommendations", lambda: nutrition.batch_recommendations(frame), recommendations,
+         batch_recommendations),
+        ("suggest_meal_modifications", lambda: nutrition.batch_meal_modifications(frame, gi_foods),
+         lambda i: nutrition.suggest_meal_modifications(gi_foods[i], records[i]), lambda result, i: result[i]),
+        ("get_health_suggestions", lambda: health.batch_health_suggestions(frame), per_user_health,
+         lambda result, i: result[i]),
+        ("get_meal_replacement_suggestions", lambda: health.batch_replacement_suggestions(meals),
+         lambda i: health.get_meal_replacement_suggestions(meals[i]), lambda result, i: result[i]),
+    ]
+    print(f"{args.users:,} users, per-user times scaled from {len(sample):,}")
+    print(f"{'rules':<34} {'batch s':>8} {'per-user s':>11} {'speedup':>8} {'users/s':>11}")
+    total = 0.0
+    for label, batch, single, pick in cases:
+        result, batch_s = timed(batch)
+        expected, sample_s = timed(lambda: [single(i) for i in sample])
+        for i in sample:
+            if pick(result, i) != expected[i]:
+                raise AssertionError(f"{label}: batch and per-user suggestions differ for user {i}")
+        single_s = sample_s * args.users / len(sample)
+        total += batch_s
+        print(f"{label:<34} {batch_s:>8.2f} {single_s:>11.2f} {single_s / batch_s:>7.1f}x "
+              f"{args.users / batch_s:>11,.0f}")
+    print(f"{'all four':<34} {total:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
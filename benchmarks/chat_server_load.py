@@ -0,0 +1,78 @@
+"""Throughput and latency of chat_server.ChatServer under simulated clients.
+
+Starts the server in-process on a free local port and drives it with
+concurrent clients, each holding its own session and sending messages
+back to back. Run from the repository root:
+    python -m benchmarks.chat_server_load --clients 200 --messages 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from chat_server import ChatServer
+
+MESSAGES = [
+    "2 idlis and coffee for breakfast",
+    "I had a bowl of rice with dal and some spinach for lunch",
+    "For dinner I'm having 2 rotis, paneer curry and a salad",
+    "A small snack with some nuts and a cup of tea",
+    "I walked 7500 steps today",
+    "3 dosas and chai for breakfast",
+    "Half a plate of fried rice and chicken curry for dinner",
+]
+
+
+async def client(port, session, count, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    rng = random.Random(session)
+    for _ in range(count):
+        request = {"session": session, "message": rng.choice(MESSAGES)}
+        start = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(args):
+    server = ChatServer(workers=args.workers, queue_size=args.queue_size, processes=args.processes)
+    await server.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(port, f"user{i}", args.messages, latencies) for i in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+    await server.shutdown()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    mode = "processes" if args.processes else "threads"
+    print(f"{args.clients} clients x {args.messages} messages, {args.workers} workers ({mode})")
+    print(f"  throughput: {len(latencies) / elapsed:10.0f} requests/s")
+    print(f"  latency p50: {statistics.median(latencies) * 1000:8.2f} ms")
+    print(f"  latency p99: {p99 * 1000:8.2f} ms")
+    print(f"  parse cache: {server.store.advisor.parse_cache.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=50, help="messages per client")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--processes", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Glucose inference latency: scikit-learn against the compiled evaluator.
+
+Trains (headless) one model of each kind, exports it with compiled_model and
+times single readings and a large batch through both paths, checking that
+the outputs agree. Run from the repository root:
+    python -m benchmarks.compiled_inference --readings 1000000
+"""
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+from sklearn.base import clone
+
+from AI_predictor1 import GlucosePredictor
+from compiled_model import CompiledModel
+
+KINDS = ("Random Forest (10 trees, depth unlimited)", "Gradient Boosting (25 stages, learning rate 0.1)", "Ridge (alpha=1.0)")
+
+
+def per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=1000000, help="batch size for the batched paths")
+    args = parser.parse_args()
+
+    predictor = GlucosePredictor()
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.train_model(plot=False)
+    data = predictor.training_data()
+    X = predictor.scaler.transform(np.array(data["sensor_reading"])[:, None])
+    y = np.array(data["glucose_level"])
+    candidates = predictor.candidate_models()
+
+    rng = np.random.default_rng(0)
+    readings = rng.uniform(150, 200, args.readings)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.npz")
+        probe = ("import sys, compiled_model; m = compiled_model.CompiledModel.load(sys.argv[1]); "
+                 "m.predict_one(170.0); print('sklearn' in sys.modules)")
+        for kind in KINDS:
+            predictor.model = clone(candidates[kind]).fit(X, y)
+            predictor.model_name = kind
+            predictor.export_compiled(path)
+            compiled = CompiledModel.load(path)
+
+            expected = predictor.model.predict(predictor.scaler.transform(readings[:, None]))
+            difference = np.abs(compiled.predict(readings) - expected).max()
+            uses_sklearn = subprocess.run([sys.executable, "-c", probe, path], capture_output=True,
+                                          text=True, check=True).stdout.strip()
+
+            print(kind)
+            print(f"  max |compiled - sklearn|:        {difference:.2e}  (evaluator imports sklearn: {uses_sklearn})")
+            print(f"  predict_glucose (sklearn):       {per_call_us(lambda: predictor.predict_glucose(170.2), 20):>10.1f} us")
+            print(f"  CompiledModel.predict_one:       {per_call_us(lambda: compiled.predict_one(170.2), 20000):>10.2f} us")
+            batch = per_call_us(lambda: predictor.predict_glucose_batch(readings), 1)
+            print(f"  predict_glucose_batch (sklearn): {args.readings / batch:>10.1f} M readings/s")
+            print(f"  CompiledModel.predict:           {args.readings / per_call_us(lambda: compiled.predict(readings), 1):>10.1f} M readings/s")
+            if compiled.steps is not None:
+                compiled.steps = None
+                sample = readings[:100000]
+                rate = len(sample) / per_call_us(lambda: compiled.predict(sample), 1)
+                print(f"  CompiledModel tree traversal:    {rate:>10.1f} M readings/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Advisor construction time against food store size.
+
+Builds synthetic food stores of increasing size in a temporary directory,
+then times opening each one and constructing HealthFoodAdvisor and
+NutritionAdvisor on top of it. Run from the repository root:
+    python -m benchmarks.food_store_startup --sizes 1000 100000 300000
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+from code import NutritionAdvisor
+from food_store import FoodStore, build_store
+from LLM import HealthFoodAdvisor
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "tu", "ne", "sho", "pa", "ri", "ven", "da", "gu", "lin", "zor"]
+CATEGORIES = ["breakfast", "main", "protein", "vegetable", "snack", "dessert", "beverage"]
+
+
+def write_synthetic_csv(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "calories", "carbs", "protein", "fat", "glycemic_index", "category"])
+        writer.writerow(["idli", 39, 8, 2, 0.5, 70, "breakfast"])
+        for i in range(rows - 1):
+            words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                     for _ in range(rng.randint(1, 3))]
+            writer.writerow([" ".join(words) + f" {i}", rng.randint(10, 400), rng.randint(0, 60),
+                             rng.randint(0, 30), rng.randint(0, 25), rng.randint(0, 100),
+                             rng.choice(CATEGORIES)])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 300000])
+    args = parser.parse_args()
+
+    print(f"{'foods':>8} {'build s':>8} {'open ms':>8} {'HFA ms':>8} {'NA ms':>8} {'parse ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            csv_path = os.path.join(tmp, f"foods_{size}.csv")
+            store_path = os.path.join(tmp, f"foods_{size}.store")
+            write_synthetic_csv(csv_path, size)
+            _, build_ms = timed(lambda: build_store(csv_path, store_path))
+
+            store, open_ms = timed(lambda: FoodStore(store_path))
+            advisor, advisor_ms = timed(lambda: HealthFoodAdvisor(food_store=store))
+            _, nutrition_ms = timed(lambda: NutritionAdvisor(food_store=store))
+            _, parse_ms = timed(lambda: advisor.generate_response("2 idlis for breakfast"))
+            print(f"{size:>8} {build_ms / 1000:>8.2f} {open_ms:>8.2f} {advisor_ms:>8.2f} "
+                  f"{nutrition_ms:>8.2f} {parse_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
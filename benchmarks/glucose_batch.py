@@ -0,0 +1,56 @@
+"""Glucose prediction throughput: predict_glucose per reading against predict_glucose_batch.
+
+Run from the repository root:
+    python -m benchmarks.glucose_batch --readings 1000000 --n-jobs 4
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+
+from AI_predictor1 import DEFAULT_CHUNK_SIZE, GlucosePredictor
+
+
+def rate(count, seconds):
+    return f"{count / seconds:>12,.0f} readings/s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=1000000, help="readings scored by the batch path")
+    parser.add_argument("--scalar-readings", type=int, default=2000, help="readings scored one at a time")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--n-jobs", type=int, default=4)
+    args = parser.parse_args()
+
+    predictor = GlucosePredictor()
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.train_model()
+    print(f"model: {type(predictor.model).__name__}")
+
+    rng = np.random.default_rng(0)
+    readings = rng.uniform(150, 200, args.readings)
+    fingers = rng.choice(["little", "thumb"], args.readings)
+
+    sample = readings[:args.scalar_readings]
+    start = time.perf_counter()
+    scalar = [predictor.predict_glucose(r, f) for r, f in zip(sample.tolist(), fingers.tolist())]
+    print(f"{'predict_glucose:':<40}{rate(len(sample), time.perf_counter() - start)}")
+
+    batch = predictor.predict_glucose_batch(sample, fingers[:len(sample)])
+    assert np.allclose(np.round(batch, 1), scalar, atol=0.051)
+
+    for label, n_jobs in (("batch", None), (f"batch, n_jobs={args.n_jobs}", args.n_jobs)):
+        start = time.perf_counter()
+        predictor.predict_glucose_batch(readings, fingers, chunk_size=args.chunk_size, n_jobs=n_jobs)
+        print(f"predict_glucose_batch ({label}):".ljust(40) + rate(len(readings), time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Cold-start cost of each entry point, measured in fresh interpreters.
+
+Each scenario runs in a new python process; the time reported is the best
+of --repeat runs minus the time of an empty interpreter. --top lists the
+slowest imports of each scenario from python -X importtime. Run from the
+repository root:
+    python -m benchmarks.import_time --repeat 5 --top 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCENARIOS = [
+    ("import LLM", "import LLM"),
+    ("import code", "import code"),
+    ("import AI_predictor1", "import AI_predictor1"),
+    ("HealthFoodAdvisor reply",
+     "from LLM import HealthFoodAdvisor; HealthFoodAdvisor().generate_response('2 idlis for breakfast')"),
+    ("NutritionAdvisor", "from code import NutritionAdvisor; NutritionAdvisor()"),
+    ("load model + predict_glucose",
+     "from AI_predictor1 import GlucosePredictor; p = GlucosePredictor(); "
+     "p.load_model({model!r}); p.predict_glucose(170)"),
+]
+
+
+def run(source, importtime=False):
+    """Run source in a fresh interpreter; return (seconds, stderr)"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", source]
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stderr
+
+
+# Imported by every interpreter before the scenario code runs
+STARTUP_MODULES = {"site", "encodings", "_io", "marshal", "posix", "zipimport", "time", "winreg", "nt"}
+
+
+def slowest_imports(stderr, top):
+    """(cumulative us, module) for the slowest imports the scenario made, two levels deep"""
+    rows = []
+    children = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # importtime prints a module's imports before the module itself
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            if name.strip() not in STARTUP_MODULES:
+                rows.extend(children)
+                rows.append((int(cumulative), name.strip()))
+            children = []
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scenario; the best is reported")
+    parser.add_argument("--top", type=int, default=0, help="slowest top-level imports to list per scenario")
+    args = parser.parse_args()
+
+    from AI_predictor1 import GlucosePredictor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, "glucose_model.joblib")
+        predictor = GlucosePredictor()
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor.train_model(plot=False)
+        predictor.save_model(model_path)
+
+        baseline = min(run("pass")[0] for _ in range(args.repeat))
+        print(f"empty interpreter: {baseline * 1000:.0f} ms (subtracted below)")
+        for label, source in SCENARIOS:
+            source = source.format(model=model_path)
+            best = min(run(source)[0] for _ in range(args.repeat))
+            print(f"{label:<30} {(best - baseline) * 1000:>7.0f} ms")
+            if args.top:
+                for cumulative, name in slowest_imports(run(source, importtime=True)[1], args.top):
+                    print(f"    {name:<26} {cumulative / 1000:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""MealHistory write throughput and day/week query latency at millions of rows.
+
+Logs pregenerated synthetic meals (three a day per user) through log_meal
+and reports rows/s until everything is committed, next to a sample written
+with one commit per meal. Then times daily_totals over a week,
+weekly_totals over four weeks and one day's meals for random users against
+the full table, and finally checks that every meal is still there after
+closing and reopening the database, and that a HealthFoodAdvisor's
+history matches its rollups after a meal is logged again and retracted. Run from the repository root:
+    python -m benchmarks.meal_history_store --rows 2000000 --users 10000
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from LLM import HealthFoodAdvisor
+from meal_history import NUTRIENTS, MealHistory
+from nutrition_rollups import NutritionRollups
+
+FOODS = ["idli", "dosa", "rice", "dal", "chapati", "chicken", "salad", "coffee", "apple", "yogurt"]
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+START = datetime.datetime(2025, 1, 1, 8)
+
+
+def synthetic_meals(users, count, seed=0):
+    """log_meal arguments for count meals spread over a year"""
+    rng = random.Random(seed)
+    menus = [{food: rng.randint(1, 3) for food in rng.sample(FOODS, 3)} for _ in range(256)]
+    meals = []
+    for i in range(count):
+        day, meal = divmod(i * 365 // count * 3 + i % 3, 3)
+        nutrition = {"calories": rng.uniform(100, 900), "carbs": rng.uniform(0, 120),
+                     "protein": rng.uniform(0, 60), "fat": rng.uniform(0, 40)}
+        logged_at = START.timestamp() + day * 86400 + meal * 5 * 3600 + rng.random() * 3600
+        meals.append((rng.choice(users), MEAL_TYPES[meal], nutrition, rng.choice(menus), logged_at))
+    return meals
+
+
+def write(history, meals):
+    start = time.perf_counter()
+    for user, meal_type, nutrition, foods, logged_at in meals:
+        history.log_meal(user, meal_type, nutrition, foods, logged_at=logged_at)
+    history.flush()
+    return len(meals) / (time.perf_counter() - start)
+
+
+def check_durable(path, meals, samples=100, seed=2):
+    """Reopen a closed history and check that every meal survived, field for field on a sample"""
+    with MealHistory(path) as history:
+        if len(history) != len(meals):
+            raise AssertionError(f"{len(meals):,} meals logged but {len(history):,} stored after close")
+        rng = random.Random(seed)
+        for user, meal_type, nutrition, foods, logged_at in rng.sample(meals, min(samples, len(meals))):
+            day = datetime.date.fromtimestamp(logged_at)
+            stored = [meal for meal in history.meals(user, day) if meal.logged_at == logged_at]
+            if not any(meal.meal_type == meal_type and meal.foods == foods and meal.calories == nutrition["calories"]
+                       for meal in stored):
+                raise AssertionError(f"{user}'s {meal_type} logged at {logged_at} did not survive close")
+
+
+def check_matches_rollups(path):
+    """Log, log again and retract meals through an advisor; the history's day totals must equal the rollups'"""
+    with MealHistory(path) as history:
+        rollups = NutritionRollups()
+        advisor = HealthFoodAdvisor(meal_history=history, user_id="alice", rollups=rollups)
+        advisor.process_meal("lunch", {"rice": 2, "dal": 1})
+        advisor.process_meal("lunch", {"rice": 3, "chicken": 1})
+        advisor.process_meal("dinner", {"roti": 2, "dal": 1})
+        advisor.process_meal("snacks", {"samosa": 1})
+        advisor.retract_meal("lunch")
+        history.flush()
+        day = datetime.date.today()
+        stored = history.totals("alice", day, day)
+        expected = rollups.totals("alice", "day", day)
+        if stored.meals != expected.meals or any(abs((getattr(stored, nutrient) or 0.0) - getattr(expected, nutrient))
+                                                 > 1e-9 for nutrient in NUTRIENTS):
+            raise AssertionError(f"Meal history totals {stored} differ from rollup totals {expected}")
+        if stored.calories != advisor.user_profile["calories_consumed"]:
+            raise AssertionError(f"Meal history has {stored.calories} kcal but the profile "
+                                 f"{advisor.user_profile['calories_consumed']}")
+
+
+def latencies(query, users, days, samples, seed=1):
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(samples):
+        start_day = START.date() + datetime.timedelta(days=rng.randrange(365 - days))
+        end_day = start_day + datetime.timedelta(days=days - 1)
+        user = rng.choice(users)
+        start = time.perf_counter()
+        query(user, start_day, end_day)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, [50, 99]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--per-commit-rows", type=int, default=2000, help="rows written with one commit each")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    users = [f"user{i}" for i in range(args.users)]
+    meals = synthetic_meals(users, args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        with MealHistory(os.path.join(tmp, "single.db"), batch_size=1) as history:
+            single = write(history, meals[:args.per_commit_rows])
+        print(f"one commit per meal:    {single:>10,.0f} rows/s")
+
+        path = os.path.join(tmp, "meals.db")
+        with MealHistory(path) as history:
+            grouped = write(history, meals)
+            stats = history.stats()
+            print(f"group commit:           {grouped:>10,.0f} rows/s "
+                  f"({stats['commits']} commits, mean {stats['mean_commit']:.0f} rows)")
+            print(f"{len(history):,} rows, {os.path.getsize(path) / 2**20:.0f} MiB")
+
+            for label, query, days in (("daily_totals, 7 days", history.daily_totals, 7),
+                                       ("weekly_totals, 28 days", history.weekly_totals, 28),
+                                       ("meals, 1 day", history.meals, 1)):
+                p50, p99 = latencies(query, users, days, args.queries)
+                print(f"{label:<24}p50 {p50:6.3f} ms  p99 {p99:6.3f} ms")
+
+        check_durable(path, meals)
+        print(f"all {len(meals):,} meals present after close and reopen")
+        check_matches_rollups(os.path.join(tmp, "advisor.db"))
+        print("history totals match the rollups after logging a meal again and retracting it")
+
+
+if __name__ == "__main__":
+    main()
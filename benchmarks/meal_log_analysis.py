@@ -0,0 +1,83 @@
+"""Bulk meal log analysis: analyze_meal_log against analyze_nutrition per meal.
+
+Generates a synthetic long-format meal log (user, timestamp, food,
+quantity), writes it to CSV, and times NutritionAdvisor.analyze_meal_log on
+the in-memory DataFrame and on the CSV in chunks, reporting peak traced
+memory, against calling analyze_nutrition once per meal on a sample.
+Run from the repository root:
+    python -m benchmarks.meal_log_analysis --rows 2000000 --chunksize 250000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from code import NutritionAdvisor
+
+
+def synthetic_log(advisor, rows, users, seed=0):
+    rng = np.random.default_rng(seed)
+    foods = np.array(list(advisor.food_db) + ["pizza", "donut"])
+    meal_ids = np.sort(rng.integers(0, max(rows // 4, 1), rows))
+    start = np.datetime64("2024-01-01T00:00")
+    return pd.DataFrame({
+        "user": np.char.add("user", (meal_ids % users).astype(str)),
+        "timestamp": start + (meal_ids // users * 6).astype("timedelta64[h]"),
+        "food": rng.choice(foods, rows),
+        "quantity": rng.integers(1, 4, rows),
+    })
+
+
+def timed(fn, trace=False):
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    if trace:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--chunksize", type=int, default=250000)
+    parser.add_argument("--sample-meals", type=int, default=20000, help="meals timed through analyze_nutrition")
+    args = parser.parse_args()
+
+    advisor = NutritionAdvisor()
+    log = synthetic_log(advisor, args.rows, args.users)
+
+    result, seconds, _ = timed(lambda: advisor.analyze_meal_log(log, chunksize=args.chunksize))
+    print(f"{args.rows} rows, {len(result.meals)} meals, {len(result.daily)} user-days")
+    print(f"analyze_meal_log (DataFrame):  {args.rows / seconds:>12,.0f} rows/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "meals.csv")
+        log.to_csv(path, index=False)
+        _, seconds, peak = timed(lambda: advisor.analyze_meal_log(path, chunksize=args.chunksize), trace=True)
+        print(f"analyze_meal_log (CSV chunks): {args.rows / seconds:>12,.0f} rows/s, "
+              f"peak traced memory {peak / 2**20:.0f} MiB (CSV is {os.path.getsize(path) / 2**20:.0f} MiB)")
+
+    sample = log[log.groupby(["user", "timestamp"]).ngroup() < args.sample_meals]
+    meals = [group["food"].repeat(group["quantity"]).tolist() for _, group in sample.groupby(["user", "timestamp"])]
+    _, seconds, _ = timed(lambda: [advisor.analyze_nutrition(foods) for foods in meals])
+    print(f"analyze_nutrition per meal:    {len(sample) / seconds:>12,.0f} rows/s (excluding grouping)")
+
+    # Same totals either way
+    check = advisor.analyze_meal_log(sample)
+    first = next(iter(sample.groupby(["user", "timestamp"])))
+    totals, _, _ = advisor.analyze_nutrition(first[1]["food"].repeat(first[1]["quantity"]).tolist())
+    assert np.allclose([totals[c] for c in ("carbs", "protein", "fat", "glycemic_load", "calories")],
+                       check.meals.loc[first[0]].iloc[:5].to_numpy(dtype=float))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""NutritionRollups update and read cost against history size.
+
+Records a year of meals (three a day) for a number of users, then times
+inserts, corrections and retractions, and reading a week's totals, at
+growing history sizes. For comparison it times recomputing the same week by
+scanning the user's recorded meals, which is what a dashboard without
+rollups has to do. Run from the repository root:
+    python -m benchmarks.nutrition_rollups --users 100 1000
+"""
+import argparse
+import datetime
+import random
+import time
+
+from nutrition_rollups import NutritionRollups
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+START = datetime.date(2025, 1, 1)
+
+
+def per_call_us(fn, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'users':>6} {'meals':>10} {'insert us':>10} {'correct us':>11} {'retract us':>11} "
+          f"{'week read us':>13} {'week scan us':>13}")
+    for users in args.users:
+        rng = random.Random(0)
+        rollups = NutritionRollups()
+        days = [(START + datetime.timedelta(days=d)).isoformat() for d in range(args.days)]
+        for user in range(users):
+            for day in days:
+                for meal_type in MEAL_TYPES:
+                    rollups.record((user, day, meal_type), user, day, meal_type,
+                                   {"calories": rng.uniform(100, 900), "carbs": rng.uniform(0, 120)})
+
+        nutrition = {"calories": 500.0, "carbs": 60.0, "protein": 20.0, "fat": 15.0}
+        insert = per_call_us(lambda i: rollups.record(("new", i), i % users, days[i % len(days)], "snacks",
+                                                      nutrition), args.calls)
+        correct = per_call_us(lambda i: rollups.record(("new", i), i % users, days[i % len(days)], "snacks",
+                                                       {"calories": 250.0}), args.calls)
+        retract = per_call_us(lambda i: rollups.retract(("new", i)), args.calls)
+        read = per_call_us(lambda i: rollups.totals(i % users, "week", days[i % len(days)]), args.calls)
+
+        def scan(i):
+            # Sum the user's meals in the week, as a dashboard without rollups would
+            user, day = i % users, datetime.date.fromisoformat(days[i % len(days)])
+            monday = (day - datetime.timedelta(days=day.weekday())).isoformat()
+            sunday = (day + datetime.timedelta(days=6 - day.weekday())).isoformat()
+            return sum(values[1] for (meal_user, meal_day, _), (_, values) in rollups.meals.items()
+                       if meal_user == user and monday <= meal_day <= sunday)
+
+        scan_us = per_call_us(scan, max(args.calls // (users * 10), 3))
+        print(f"{users:>6} {len(rollups):>10,} {insert:>10.1f} {correct:>11.1f} {retract:>11.1f} "
+              f"{read:>13.1f} {scan_us:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Throughput and latency of prediction_server.PredictionServer with and without micro-batching.
+
+Starts the server in-process on a free local port, once with max_batch=1
+and once with batching, and drives each with concurrent keep-alive HTTP
+clients sending single readings back to back. Uses --model if it exists,
+otherwise trains a model in memory without saving it. Run from the
+repository root:
+    python -m benchmarks.prediction_server_load --clients 200 --requests 25
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import time
+
+from AI_predictor1 import DEFAULT_MODEL_PATH, GlucosePredictor
+from prediction_server import PredictionServer
+
+
+async def client(port, seed, count, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    rng = random.Random(seed)
+    for _ in range(count):
+        body = json.dumps({"reading": round(rng.uniform(160, 196), 1),
+                           "finger_type": rng.choice(["little", "thumb"])}).encode()
+        start = time.perf_counter()
+        writer.write(b"POST /predict HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+        await writer.drain()
+        status = await reader.readline()
+        length = 0
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        reply = json.loads(await reader.readexactly(length))
+        latencies.append(time.perf_counter() - start)
+        if b" 200 " not in status:
+            raise RuntimeError(reply.get("error"))
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_load(predictor, args, max_batch):
+    server = PredictionServer(max_batch=max_batch, max_wait_ms=args.max_wait_ms, queue_size=args.queue_size,
+                              predictor=predictor)
+    await server.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, i, args.requests, latencies) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    await server.shutdown()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    stats = server.stats()
+    label = "no batching" if max_batch == 1 else f"max_batch={max_batch}, max_wait={args.max_wait_ms} ms"
+    print(f"{label}")
+    print(f"  throughput: {len(latencies) / elapsed:10.0f} requests/s")
+    print(f"  latency p50: {statistics.median(latencies) * 1000:8.2f} ms")
+    print(f"  latency p99: {p99 * 1000:8.2f} ms")
+    print(f"  batches: {stats['batches']}, mean size {stats['mean_batch']:.1f}, largest {stats['largest_batch']}")
+
+
+async def run(args):
+    predictor = GlucosePredictor()
+    if os.path.exists(args.model):
+        predictor.load_model(args.model)
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor.train_model(plot=False)
+    print(f"{args.clients} clients x {args.requests} requests, model {predictor.model_name}")
+    for max_batch in (1, args.max_batch):
+        await run_load(predictor, args, max_batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=25, help="requests per client")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--queue-size", type=int, default=4096)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Bytes per user: one HealthFoodAdvisor per user versus a shared SessionStore.
+
+Run from the repository root:
+    python -m benchmarks.profile_memory --users 100000
+"""
+import argparse
+import gc
+import tracemalloc
+
+from LLM import HealthFoodAdvisor
+from profile_store import SessionStore
+
+
+def measure(build):
+    """Return (result, bytes allocated and still held by build())"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000, help="profiles to create in the session store")
+    parser.add_argument("--advisors", type=int, default=500, help="full advisors to create for comparison")
+    args = parser.parse_args()
+
+    _, advisor_bytes = measure(lambda: [HealthFoodAdvisor() for _ in range(args.advisors)])
+
+    store = SessionStore()
+
+    def add_users():
+        for user_id in range(args.users):
+            store.advisor_for(user_id).set_user_profile(f"user{user_id}", 40, 70.0, 170.0, 6.1)
+
+    _, profile_bytes = measure(add_users)
+
+    def log_meals():
+        for user_id in range(args.users):
+            store.generate_response(user_id, "2 idlis and coffee for breakfast")
+
+    _, meal_bytes = measure(log_meals)
+
+    print(f"HealthFoodAdvisor per user:         {advisor_bytes / args.advisors:10.0f} bytes")
+    print(f"SessionStore profile per user:      {profile_bytes / args.users:10.0f} bytes")
+    print(f"SessionStore after one meal logged: {(profile_bytes + meal_bytes) / args.users:10.0f} bytes")
+    print(f"Parse cache: {store.advisor.parse_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
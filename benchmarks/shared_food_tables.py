@@ -0,0 +1,123 @@
+"""Memory per worker process: private food dicts versus one SharedFoodStore.
+
+Starts growing numbers of worker processes that each build a
+HealthFoodAdvisor and a NutritionAdvisor over the built-in foods plus a
+synthetic vocabulary, run a fixed mix of chat messages and nutrition
+lookups, and then report their memory while all of them are alive. In the
+private mode every worker holds the tables as Python dicts (inherited from
+the parent on fork, then dirtied by reference counting); in the shared mode
+they attach to one SharedFoodStore published by the parent. RSS counts
+shared pages in every process, so PSS (shared pages split between the
+processes mapping them) and USS (pages private to the worker) are reported
+too; both come from /proc/self/smaps_rollup and need Linux. Run from the
+repository root:
+    python -m benchmarks.shared_food_tables --foods 200000 --workers 1 2 4 8
+"""
+import argparse
+import gc
+import multiprocessing
+import random
+
+from code import NutritionAdvisor
+from food_store import SharedFoodStore, builtin_records
+from LLM import HealthFoodAdvisor
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "tu", "ne", "sho", "pa", "ri", "ven", "da", "gu", "lin", "zor"]
+CATEGORIES = ["breakfast", "main", "protein", "vegetable", "snack", "dessert", "beverage"]
+MESSAGES = ["2 idlis and coffee for breakfast", "had 3 plates of fried rice and chicken curry for dinner",
+            "a bowl of dal with 2 chapatis for lunch", "apple and greek yogurt as a snack"]
+
+
+def synthetic_records(count, seed=0):
+    rng = random.Random(seed)
+    return [{"name": " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                              for _ in range(rng.randint(1, 3))) + f" {i}",
+             "calories": rng.randint(10, 400), "carbs": rng.randint(0, 60), "protein": rng.randint(0, 30),
+             "fat": rng.randint(0, 25), "glycemic_index": rng.randint(0, 100), "category": rng.choice(CATEGORIES)}
+            for i in range(count)]
+
+
+def memory():
+    """(RSS, PSS, USS) of this process in bytes; PSS and USS are None without smaps_rollup"""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {key: int(value.split()[0]) * 1024 for key, value in
+                      (line.split(":", 1) for line in f if line.rstrip().endswith("kB"))}
+        return fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, None, None
+
+
+def worker(tables, barrier, results):
+    # tables is a SharedFoodStore, or a private dict of the same rows
+    if isinstance(tables, SharedFoodStore):
+        advisor = HealthFoodAdvisor(food_store=tables)
+        nutrition = NutritionAdvisor(food_store=tables)
+    else:
+        advisor = HealthFoodAdvisor()
+        advisor.food_database.update(tables)
+        nutrition = NutritionAdvisor()
+        nutrition.food_db.update(tables)
+
+    names = list(nutrition.food_db)
+    rng = random.Random(1)
+    for _ in range(50):
+        for message in MESSAGES:
+            advisor.generate_response(message)
+    advisor.calculate_batch_nutrition([{name: 1 for name in rng.sample(names, 5)} for _ in range(1000)])
+    nutrition.analyze_nutrition(rng.sample(names, 1000))
+
+    # Measure with every worker alive, so shared pages are split between all of them
+    barrier.wait()
+    results.put(memory())
+    barrier.wait()
+
+
+def run(context, tables, workers):
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(tables, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return samples
+
+
+def mib(values):
+    values = [value for value in values if value is not None]
+    return f"{sum(values) / len(values) / 2**20:>9.1f}" if values else f"{'n/a':>9}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--foods", type=int, default=200000, help="synthetic foods added to the built-in ones")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--start-method", default="fork", choices=multiprocessing.get_all_start_methods())
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context(args.start_method)
+    store = SharedFoodStore.create(builtin_records() + synthetic_records(args.foods))
+    foods = dict(store.items())
+    print(f"{len(store)} foods; shared block {store._mapping.size() / 2**20:.1f} MiB; start method {args.start_method}")
+    print(f"{'mode':<8} {'workers':>7} {'RSS MiB':>9} {'PSS MiB':>9} {'USS MiB':>9} {'total PSS':>10}")
+    try:
+        for mode in ("private", "shared"):
+            if mode == "shared":
+                # Forked shared workers should not inherit the parent's copy of the dicts
+                del foods
+                gc.collect()
+            for workers in args.workers:
+                samples = run(context, foods if mode == "private" else store, workers)
+                rss, pss, uss = zip(*samples)
+                total = f"{sum(pss) / 2**20:>10.1f}" if None not in pss else f"{'n/a':>10}"
+                print(f"{mode:<8} {workers:>7} {mib(rss)} {mib(pss)} {mib(uss)} {total}", flush=True)
+    finally:
+        store.unlink()
+
+
+if __name__ == "__main__":
+    main()
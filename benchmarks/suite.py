@@ -0,0 +1,281 @@
+"""Hot-path microbenchmarks with JSON baselines and regression gating.
+
+Every case times one hot path at one point of a scaling parameter
+(vocabulary size, message length, batch size or dataset size) and records
+the best and median seconds per call. Record a baseline, then compare a
+later run against it; compare exits with status 1 when any case is slower
+than the baseline by more than the threshold. Run from the repository root:
+    python -m benchmarks.suite run --output benchmarks/baseline.json
+    python -m benchmarks.suite run --output current.json --filter predict
+    python -m benchmarks.suite compare benchmarks/baseline.json current.json --threshold 0.25
+"""
+import argparse
+import contextlib
+import datetime
+import fnmatch
+import io
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from AI_predictor1 import GlucosePredictor
+from LLM import HealthFoodAdvisor
+from code import NutritionAdvisor
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "tu", "ne", "sho", "pa", "ri", "ven", "da", "gu", "lin", "zor"]
+FILLER = ["and", "with", "a", "bit", "of", "then", "some", "for", "lunch", "today", "i", "had"]
+UNITS = ["cup", "bowl", "plate", "piece", "slice"]
+
+# Distinct inputs cycled through by each case, so caches do not hide the work
+POOL_SIZE = 256
+
+CASES = {}
+
+
+def case(name, **grid):
+    """Register a setup function run for every combination of grid values"""
+    def register(setup):
+        keys = list(grid)
+        for values in itertools.product(*(grid[key] for key in keys)):
+            params = dict(zip(keys, values))
+            label = ",".join(f"{key}={value}" for key, value in params.items())
+            CASES[f"{name}[{label}]" if label else name] = (setup, params)
+        return setup
+    return register
+
+
+def synthetic_names(count, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        names.add(" ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                           for _ in range(rng.randint(1, 2))))
+    return sorted(names)
+
+
+def advisor_with_vocabulary(extra_foods):
+    """Uncached HealthFoodAdvisor with extra_foods synthetic foods added to its database"""
+    advisor = HealthFoodAdvisor(parse_cache_size=0)
+    rng = random.Random(1)
+    foods = {name: {"calories": rng.randint(10, 400), "carbs": rng.randint(0, 60), "protein": rng.randint(0, 30),
+                    "fat": rng.randint(0, 25), "category": "snack"} for name in synthetic_names(extra_foods)}
+    advisor.food_database.update(foods)
+    return advisor
+
+
+def messages(advisor, words, seed=2):
+    """POOL_SIZE meal messages of about `words` tokens mixing foods, quantities, units and filler"""
+    rng = random.Random(seed)
+    foods = list(advisor.food_database)
+    pool = []
+    for _ in range(POOL_SIZE):
+        tokens = []
+        while len(tokens) < words:
+            roll = rng.random()
+            if roll < 0.3:
+                tokens += [str(rng.randint(1, 3)), rng.choice(UNITS), "of", rng.choice(foods)]
+            elif roll < 0.6:
+                tokens.append(rng.choice(foods))
+            else:
+                tokens.append(rng.choice(FILLER))
+        pool.append(" ".join(tokens[:max(words, 1)]))
+    return pool
+
+
+def cycling(fn, inputs):
+    inputs = itertools.cycle(inputs)
+    return lambda: fn(next(inputs))
+
+
+@case("extract_food_items", vocabulary=[0, 1000, 10000], words=[16])
+@case("extract_food_items", vocabulary=[0], words=[4, 64, 256])
+def bench_extract(vocabulary, words):
+    advisor = advisor_with_vocabulary(vocabulary)
+    return cycling(advisor.extract_food_items, messages(advisor, words))
+
+
+@case("calculate_nutrition", foods=[1, 10, 100])
+def bench_calculate_nutrition(foods):
+    advisor = advisor_with_vocabulary(max(0, foods - len(HealthFoodAdvisor().food_database)))
+    rng = random.Random(3)
+    names = list(advisor.food_database)
+    meals = [{name: rng.randint(1, 3) for name in rng.sample(names, foods)} for _ in range(POOL_SIZE)]
+    return cycling(advisor.calculate_nutrition, meals)
+
+
+@case("calculate_batch_nutrition", meals=[10, 1000, 10000])
+def bench_batch_nutrition(meals):
+    advisor = HealthFoodAdvisor()
+    rng = random.Random(4)
+    names = list(advisor.food_database)
+    batch = [{name: rng.randint(1, 3) for name in rng.sample(names, 5)} for _ in range(meals)]
+    return lambda: advisor.calculate_batch_nutrition(batch)
+
+
+@case("generate_response", vocabulary=[0, 10000], words=[16])
+@case("generate_response", vocabulary=[0], words=[64])
+def bench_generate_response(vocabulary, words):
+    advisor = advisor_with_vocabulary(vocabulary)
+    pool = [message + " for lunch" for message in messages(advisor, words)]
+    return cycling(lambda message: advisor.generate_response(message).render(), pool)
+
+
+@case("analyze_nutrition", foods=[10, 100, 1000])
+def bench_analyze_nutrition(foods):
+    advisor = NutritionAdvisor()
+    rng = random.Random(5)
+    names = list(advisor.food_db) + ["unknown food"]
+    lists = [[rng.choice(names) for _ in range(foods)] for _ in range(16)]
+    return cycling(advisor.analyze_nutrition, lists)
+
+
+@case("calculate_recommendations", steps=[3000, 12000])
+def bench_calculate_recommendations(steps):
+    advisor = NutritionAdvisor()
+    nutrition, _, _ = advisor.analyze_nutrition(list(advisor.food_db))
+    return lambda: advisor.calculate_recommendations(nutrition, steps, steps * 0.04)
+
+
+def trained_predictor(rows=None):
+    """GlucosePredictor trained headless; rows beyond the 40 built-in ones replace its data with a noisy synthetic set"""
+    predictor = GlucosePredictor()
+    if rows is not None and rows > len(predictor.training_data()["sensor_reading"]):
+        rng = np.random.default_rng(6)
+        readings = rng.uniform(160, 196, rows)
+        glucose = 3 * (readings - 160) + 80 + rng.normal(0, 15, rows)
+        data = {"sensor_reading": readings.round(1).tolist(), "glucose_level": glucose.round().tolist(),
+                "finger_type": ["little"] * rows}
+        predictor.training_data = lambda: data
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.train_model(plot=False)
+    return predictor
+
+
+@case("train_model", rows=[40, 400])
+def bench_train_model(rows):
+    predictor = trained_predictor(rows)
+
+    def train():
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor.train_model(plot=False)
+    return train
+
+
+@case("predict_glucose")
+def bench_predict_glucose():
+    predictor = trained_predictor()
+    return cycling(predictor.predict_glucose, np.linspace(160, 196, POOL_SIZE).tolist())
+
+
+@case("predict_glucose_batch", readings=[1, 1000, 100000])
+def bench_predict_glucose_batch(readings):
+    predictor = trained_predictor()
+    batch = np.random.default_rng(7).uniform(160, 196, readings)
+    return lambda: predictor.predict_glucose_batch(batch)
+
+
+def measure(fn, min_time, repeat):
+    """Best and median seconds per call over `repeat` timed runs of at least min_time each"""
+    fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+    runs = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - start) / number)
+    return {"best": min(runs), "median": float(np.median(runs)), "number": number, "repeat": repeat}
+
+
+def run(args):
+    selected = {name: spec for name, spec in CASES.items()
+                if not args.filter or any(fnmatch.fnmatch(name, f"*{pattern}*") for pattern in args.filter)}
+    results = {}
+    for name, (setup, params) in selected.items():
+        fn = setup(**params)
+        results[name] = measure(fn, args.min_time, args.repeat)
+        print(f"{name:<55} {results[name]['best'] * 1e6:>14.2f} us", flush=True)
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "min_time": args.min_time,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+def compare(args):
+    """Print per-case ratios; return 1 if any case regressed past the threshold"""
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+
+    regressions = []
+    print(f"{'case':<55} {'baseline us':>12} {'current us':>12} {'ratio':>7}")
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline or name not in current:
+            print(f"{name:<55} {'only in ' + ('current' if name in current else 'baseline'):>33}")
+            continue
+        before, after = baseline[name][args.statistic], current[name][args.statistic]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if ratio > 1 + args.threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<55} {before * 1e6:>12.2f} {after * 1e6:>12.2f} {ratio:>7.2f}{flag}")
+
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="time the cases and write a JSON report")
+    run_parser.add_argument("--output", required=True)
+    run_parser.add_argument("--filter", nargs="*", help="only cases whose name contains one of these patterns")
+    run_parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timed run")
+    run_parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    compare_parser = commands.add_parser("compare", help="compare a report against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    compare_parser.add_argument("--statistic", choices=["best", "median"], default="best")
+    commands.add_parser("list", help="list the case names")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args)
+    elif args.command == "compare":
+        sys.exit(compare(args))
+    else:
+        print("\n".join(CASES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Online per-user calibration layered over a trained glucose model.
+
+Each calibration pair (sensor reading, reference glucose) updates the
+user's residual against the base model: reference - base prediction. A
+user's correction is a shrunk offset plus a shrunk slope on the reading,
+solved from exponentially decayed running sums. An update is O(1) and
+touches one row of a set of NumPy arrays shared by all users, so thousands
+of users can be recalibrated continuously without retraining the base
+model. Running mean/variance of every reading seen feed the slope's
+shrinkage, keeping it independent of the sensor's scale.
+"""
+import json
+
+import numpy as np
+
+# Per-user running sums, each an array indexed by user row
+SUMS = ("weight", "x", "residual", "xx", "x_residual")
+
+
+class UserCalibration:
+    """Per-user residual corrections kept as struct-of-arrays running sums"""
+
+    def __init__(self, forgetting=0.98, offset_prior=2.0, slope_prior=5.0, capacity=1024):
+        # forgetting decays old pairs on each new one; the priors are pseudo-counts shrinking
+        # the offset and slope towards zero while a user has few pairs
+        self.forgetting = forgetting
+        self.offset_prior = offset_prior
+        self.slope_prior = slope_prior
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        self.rows = {}
+        self.sums = {name: np.zeros(capacity) for name in SUMS}
+        # Welford running statistics over every calibration reading
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, user_id):
+        return user_id in self.rows
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count > 1 and self.m2 > 0 else 1.0
+
+    def _row(self, user_id):
+        row = self.rows.get(user_id)
+        if row is None:
+            row = self.rows[user_id] = len(self.rows)
+            if row == len(self.sums["weight"]):
+                for name in SUMS:
+                    self.sums[name] = np.concatenate((self.sums[name], np.zeros(row)))
+        return row
+
+    def update(self, user_id, sensor_reading, residual):
+        """Add one (reading, reference - base prediction) pair for a user"""
+        x = float(sensor_reading)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+        row = self._row(user_id)
+        s = self.sums
+        for name, value in zip(SUMS, (1.0, x, residual, x * x, x * residual)):
+            s[name][row] = s[name][row] * self.forgetting + value
+
+    def corrections(self, user_rows, sensor_readings):
+        """Corrections for arrays of user rows (-1 for uncalibrated) and readings"""
+        user_rows = np.asarray(user_rows, dtype=np.int64)
+        x = np.asarray(sensor_readings, dtype=np.float64)
+        known = user_rows >= 0
+        rows = np.where(known, user_rows, 0)
+        weight, sx, sr, sxx, sxr = (self.sums[name][rows] for name in SUMS)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            x_mean = np.where(weight > 0, sx / weight, 0.0)
+            r_mean = np.where(weight > 0, sr / weight, 0.0)
+            cxx = np.maximum(sxx - weight * x_mean * x_mean, 0.0)
+            cxr = sxr - weight * x_mean * r_mean
+        offset = weight * r_mean / (weight + self.offset_prior)
+        slope = cxr / (cxx + self.slope_prior * self.variance)
+        return np.where(known, offset + slope * (x - x_mean), 0.0)
+
+    def correction(self, user_id, sensor_reading):
+        """Correction to add to the base prediction for one user and reading"""
+        row = self.rows.get(user_id, -1)
+        return float(self.corrections([row], [sensor_reading])[0])
+
+    def rows_for(self, user_ids):
+        """Row per user id, -1 for users without calibration pairs"""
+        return np.fromiter((self.rows.get(user_id, -1) for user_id in user_ids), dtype=np.int64)
+
+    def save(self, path):
+        """Write the calibration state as an .npz file"""
+        n = len(self.rows)
+        settings = {"forgetting": self.forgetting, "offset_prior": self.offset_prior,
+                    "slope_prior": self.slope_prior, "count": self.count, "mean": self.mean, "m2": self.m2}
+        np.savez(path, user_ids=np.array(json.dumps(list(self.rows))), settings=np.array(json.dumps(settings)),
+                 **{name: values[:n] for name, values in self.sums.items()})
+
+    @classmethod
+    def load(cls, path):
+        def key(value):
+            # JSON turns tuples into lists
+            return tuple(key(item) for item in value) if isinstance(value, list) else value
+
+        with np.load(path) as data:
+            settings = json.loads(str(data["settings"]))
+            calibration = cls(settings["forgetting"], settings["offset_prior"], settings["slope_prior"])
+            calibration.count, calibration.mean, calibration.m2 = settings["count"], settings["mean"], settings["m2"]
+            user_ids = json.loads(str(data["user_ids"]))
+            calibration.rows = {key(user_id): row for row, user_id in enumerate(user_ids)}
+            for name in SUMS:
+                calibration.sums[name] = np.concatenate((data[name], np.zeros(max(len(user_ids), 1))))
+        return calibration
@@ -0,0 +1,272 @@
+"""Asyncio chat server for HealthFoodAdvisor.
+
+Clients send newline-delimited JSON requests such as
+    {"session": "alice", "message": "2 idlis and coffee for breakfast"}
+and receive one JSON line back per request:
+    {"session": "alice", "response": "Okay, I've recorded your breakfast: ..."}
+Adding "format": "json" to a request returns the structured result instead:
+    {"session": "alice", "result": {"kind": "meal", "totals": {...}, ...}}
+
+Run from the repository root:
+    python chat_server.py --port 8765
+    python chat_server.py --unix /tmp/advisor.sock --processes
+    python chat_server.py --port 8765 --history meals.db
+"""
+import argparse
+import asyncio
+import json
+import signal
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from food_store import FoodStore, SharedFoodStore
+from LLM import HealthFoodAdvisor
+from meal_history import MealHistory
+from profile_store import SessionStore
+
+# Longest request line read; longer lines get an error reply and are skipped
+LINE_LIMIT = 64 * 1024
+
+# Advisor used by parse-only worker processes
+_worker_advisor = None
+
+
+def _worker_config(advisor):
+    """What a parse worker needs to parse as advisor does: its vocabulary tables, picklable, and parse settings"""
+    foods = advisor.food_database
+    if isinstance(foods, SharedFoodStore):
+        pass  # pickles as its name; workers attach to the same block
+    elif isinstance(foods, FoodStore):
+        foods = foods.path  # workers map the same files
+    else:
+        foods = {food: dict(row) for food, row in foods.items()}
+    return {
+        "foods": foods,
+        "synonyms": dict(advisor.synonyms),
+        "units": dict(advisor.units),
+        "meal_patterns": {meal: list(words) for meal, words in advisor.meal_patterns.items()},
+        "fuzzy_threshold": advisor.fuzzy_threshold,
+        "parse_cache_size": advisor.parse_cache.maxsize,
+    }
+
+
+def _init_worker(config):
+    global _worker_advisor
+    foods = config["foods"]
+    advisor = HealthFoodAdvisor(config["parse_cache_size"], config["fuzzy_threshold"],
+                                food_store=None if isinstance(foods, dict) else foods)
+    if isinstance(foods, dict):
+        advisor.food_database = foods
+    advisor.synonyms = config["synonyms"]
+    advisor.units = config["units"]
+    advisor.meal_patterns = config["meal_patterns"]
+    advisor.rebuild_lookups()
+    _worker_advisor = advisor
+
+
+def _parse_in_worker(message):
+    return _worker_advisor.parse_meal(message)
+
+
+async def _read_line(reader):
+    """Next line from reader; None for a line longer than the reader's limit, which is read through and dropped"""
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError as e:
+        consumed = e.consumed
+    while True:
+        await reader.readexactly(consumed)
+        try:
+            await reader.readuntil(b"\n")
+            return None
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+
+
+class ChatServer:
+    """Serve generate_response to many concurrent sessions.
+
+    Each session is pinned to one of `workers` dispatchers, so a session's
+    messages are handled in order without locks. Every dispatcher has a
+    bounded queue; when it is full, connection handlers stop reading from
+    their sockets until it drains. Message handling runs in a worker pool so
+    the event loop never blocks on it. With processes=True only the pure
+    parse runs in worker processes; the rest of generate_response (totals,
+    rules, profile and history updates) runs in a thread pool in this one.
+    Parse workers start with a copy of the serving advisor's vocabulary and
+    parse settings, and are replaced when its vocabulary changes.
+    """
+
+    def __init__(self, store=None, workers=4, queue_size=64, processes=False):
+        self.store = store if store is not None else SessionStore()
+        self.workers = workers
+        self.queue_size = queue_size
+        self.processes = processes
+        self.requests_served = 0
+        self._server = None
+        self._queues = []
+        self._dispatchers = []
+        self._executor = None
+        self._executor_version = None
+        self._threads = None
+        self._connections = {}
+        self._closing = False
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        """Start listening on a TCP port, or on a Unix socket when path is given"""
+        self._threads = ThreadPoolExecutor(self.workers, thread_name_prefix="advisor")
+        if self.processes:
+            self._parse_pool()
+        else:
+            self._executor = self._threads
+        self._queues = [asyncio.Queue(self.queue_size) for _ in range(self.workers)]
+        self._dispatchers = [asyncio.create_task(self._dispatch(queue)) for queue in self._queues]
+
+        if path:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=path, limit=LINE_LIMIT)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port, limit=LINE_LIMIT)
+        return self._server
+
+    @property
+    def sockets(self):
+        return self._server.sockets if self._server else ()
+
+    async def shutdown(self):
+        """Stop accepting connections, finish queued requests, then release the workers"""
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for queue in self._queues:
+            await queue.join()
+        # Idle connections are waiting on readline; closing them lets their handlers finish
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        for dispatcher in self._dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._threads is not None:
+            self._threads.shutdown(wait=True)
+
+    def _parse_pool(self):
+        """Parse worker processes for the serving advisor's current vocabulary, replaced when it has changed"""
+        advisor = self.store.advisor
+        version = advisor.vocabulary_version()
+        if version != self._executor_version:
+            previous = self._executor
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                 initargs=(_worker_config(advisor),))
+            self._executor_version = version
+            if previous is not None:
+                # Parses already submitted still finish in the old workers
+                previous.shutdown(wait=False)
+        return self._executor
+
+    def _queue_for(self, session):
+        return self._queues[zlib.crc32(session.encode()) % len(self._queues)]
+
+    async def _dispatch(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            session, message, future = await queue.get()
+            try:
+                if self.processes:
+                    parsed = await loop.run_in_executor(self._parse_pool(), _parse_in_worker, message)
+                    response = await loop.run_in_executor(
+                        self._threads, self.store.generate_response, session, message, parsed
+                    )
+                else:
+                    response = await loop.run_in_executor(
+                        self._executor, self.store.generate_response, session, message
+                    )
+                if not future.done():
+                    future.set_result(response)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.requests_served += 1
+                queue.task_done()
+
+    async def _handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while not self._closing:
+                line = await _read_line(reader)
+                if line is None:
+                    reply = {"error": f"Request line longer than {LINE_LIMIT} bytes"}
+                    writer.write(json.dumps(reply).encode() + b"\n")
+                    await writer.drain()
+                    continue
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    session = str(request["session"])
+                    message = str(request["message"])
+                except (ValueError, KeyError, TypeError):
+                    reply = {"error": "Expected a JSON object with 'session' and 'message'"}
+                else:
+                    future = loop.create_future()
+                    # Blocks while the dispatcher's queue is full, which stops us reading the socket
+                    await self._queue_for(session).put((session, message, future))
+                    try:
+                        response = await future
+                        if request.get("format") == "json":
+                            reply = {"session": session, "result": response.to_dict()}
+                        else:
+                            reply = {"session": session, "response": str(response)}
+                    except Exception as e:
+                        reply = {"session": session, "error": str(e)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+
+async def serve(args):
+    history = MealHistory(args.history) if args.history else None
+    store = SessionStore(HealthFoodAdvisor(meal_history=history))
+    server = ChatServer(store, workers=args.workers, queue_size=args.queue_size, processes=args.processes)
+    await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Health Food Advisor chat server listening on {where}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    print("Shutting down...")
+    await server.shutdown()
+    if history is not None:
+        history.close()
+    print(f"Served {server.requests_served} requests for {len(server.store)} sessions.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Health Food Advisor chat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=4, help="dispatchers and pool workers")
+    parser.add_argument("--queue-size", type=int, default=64, help="pending requests per dispatcher")
+    parser.add_argument("--processes", action="store_true", help="parse messages in worker processes")
+    parser.add_argument("--history", help="SQLite meal history database every logged meal is appended to")
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Declarative coaching rules for both advisors, evaluated per meal or in bulk.
+
+The thresholds behind the advisors' suggestions live here as tables:
+    - Tiers: first-match bands (activity level by steps, HbA1c band) that
+      set values such as protein and carb targets
+    - Rule: a condition over named values and the messages it adds,
+      e.g. protein below its target or glycemic load above 50
+    - FoodRule: messages added once per food of a meal found in named
+      food sets, e.g. high-GI foods
+A RuleSet compiles each condition once. evaluate_one() runs it on one row
+of scalars, which is what the advisors' per-meal methods do; evaluate()
+runs it on whole columns (a DataFrame or a dict of arrays), so each rule
+is a single NumPy expression over every user or meal and Python only
+formats the messages that fire. Both produce the same messages for the
+same values. Within a row, food messages come first in food order, then
+rule messages in table order.
+"""
+import contextlib
+import gc
+import string
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+
+# name of the tier, condition selecting it, and the values it sets
+Tier = namedtuple("Tier", ["name", "when", "values"])
+
+# group the messages go to, condition over named values, message templates
+Rule = namedtuple("Rule", ["group", "when", "messages"])
+
+# group, names of the food sets a food must be in, message templates with {food} and {options},
+# the last set's entry for the food when that set is a dict
+FoodRule = namedtuple("FoodRule", ["group", "foods", "messages"])
+
+# Nothing but the named values and constants is visible to conditions
+_GLOBALS = {"__builtins__": {}}
+
+
+def _fields(template):
+    """Top-level names a format template refers to"""
+    return {field.split("[")[0].split(".")[0] for _, field, _, _ in string.Formatter().parse(template) if field}
+
+
+def _positional(template, names):
+    """template with the fields of names turned into positional fields in that order, so each row
+    formats from a tuple of values rather than a dict built for it"""
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is not None:
+            root = field.split("[")[0].split(".")[0]
+            if root in names:
+                field = str(names.index(root)) + field[len(root):]
+            parts.append("{" + field + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}")
+    return "".join(parts)
+
+
+def _length(columns):
+    if hasattr(columns, "index"):
+        return len(columns.index)
+    return len(next(iter(columns.values()))) if columns else 0
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    # Batch results are a few small lists per row and can't form cycles, so collector passes over
+    # them are wasted work that otherwise doubles evaluate() time at hundreds of thousands of rows
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _condition(code, namespace, rows):
+    return np.broadcast_to(np.asarray(eval(code, _GLOBALS, namespace), dtype=bool), (rows,))
+
+
+class Tiers:
+    """First-match table naming a band and the values that come with it"""
+
+    def __init__(self, name, fields, tiers):
+        self.name = name
+        self.fields = tuple(fields)
+        self.tiers = tuple(tiers)
+        self._conditions = [compile(tier.when, f"<tier {tier.name}>", "eval") for tier in self.tiers]
+
+    def evaluate_one(self, values):
+        """{name: tier name, field: value, ...} for the first tier whose condition holds"""
+        for tier, code in zip(self.tiers, self._conditions):
+            if eval(code, _GLOBALS, dict(values)):
+                return {self.name: tier.name, **dict(zip(self.fields, tier.values))}
+        raise ValueError(f"No {self.name} tier matches {dict(values)}")
+
+    def evaluate(self, columns):
+        """{name: array of tier names, field: array of values, ...} for every row"""
+        rows = _length(columns)
+        namespace = {key: np.asarray(columns[key]) for key in columns}
+        conditions = np.stack([_condition(code, namespace, rows) for code in self._conditions])
+        if not conditions.any(axis=0).all():
+            raise ValueError(f"Some rows match no {self.name} tier")
+        # Index of each row's first matching tier
+        first = conditions.argmax(axis=0)
+        result = {self.name: np.array([tier.name for tier in self.tiers])[first]}
+        for i, field in enumerate(self.fields):
+            result[field] = np.array([tier.values[i] for tier in self.tiers])[first]
+        return result
+
+
+class RuleSet:
+    """Rules and food rules compiled for one row of scalars or whole columns at once"""
+
+    def __init__(self, rules, constants=None, fallbacks=None):
+        # constants are named values every rule and message can use; fallbacks maps a group to
+        # the message it gets when no rule adds one
+        self.rules = [rule for rule in rules if isinstance(rule, Rule)]
+        self.food_rules = [rule for rule in rules if isinstance(rule, FoodRule)]
+        self.groups = list(dict.fromkeys(rule.group for rule in rules))
+        self.constants = dict(constants or {})
+        self.fallbacks = dict(fallbacks or {})
+        self._conditions = [compile(rule.when, f"<rule {rule.when}>", "eval") for rule in self.rules]
+
+    def _food_options(self, rule, food, constants):
+        options = constants[rule.foods[-1]]
+        return options.get(food) if isinstance(options, dict) else None
+
+    def evaluate_one(self, values, foods=(), constants=None):
+        """{group: [message, ...]} for one row; foods lists the meal's foods in order"""
+        constants = {**self.constants, **(constants or {})}
+        namespace = {**constants, **values}
+        results = {group: [] for group in self.groups}
+
+        for food in foods:
+            for rule in self.food_rules:
+                if all(food in constants[name] for name in rule.foods):
+                    fields = dict(namespace, food=food, options=self._food_options(rule, food, constants))
+                    results[rule.group].extend(template.format(**fields) for template in rule.messages)
+
+        for rule, code in zip(self.rules, self._conditions):
+            if eval(code, _GLOBALS, namespace):
+                results[rule.group].extend(template.format(**namespace) for template in rule.messages)
+
+        for group, message in self.fallbacks.items():
+            if not results[group]:
+                results[group].append(message)
+        return results
+
+    def _messages(self, template, constants, namespace, rows, extra=None):
+        """template formatted for each of rows, an index array; extra holds a list of values per row"""
+        extra = extra or {}
+        names = _fields(template)
+        fixed = {name: constants[name] for name in names if name in constants and name not in extra}
+        varying = sorted(names - set(fixed))
+        if not varying:
+            # Same message for every row, formatted once
+            return [template.format(**fixed)] * len(rows)
+        values = [extra[name] if name in extra else namespace[name][rows].tolist() for name in varying]
+        positional = _positional(template, varying)
+        return [positional.format(*row, **fixed) for row in zip(*values)]
+
+    def evaluate(self, columns, foods=None, constants=None):
+        """{group: [[message, ...] per row]} for every row of columns, a DataFrame or dict of arrays.
+
+        foods, when given, holds one list of food names per row.
+        """
+        with _gc_paused():
+            return self._evaluate(columns, foods, constants)
+
+    def _evaluate(self, columns, foods, constants):
+        constants = {**self.constants, **(constants or {})}
+        rows = _length(columns) or (len(foods) if foods is not None else 0)
+        namespace = {**constants, **{key: np.asarray(columns[key]) for key in columns}}
+        results = {group: [[] for _ in range(rows)] for group in self.groups}
+
+        if foods is not None and self.food_rules:
+            flat = list(chain.from_iterable(foods))
+            row_of = np.repeat(np.arange(rows), [len(row_foods) for row_foods in foods])
+            # Membership is decided once per distinct food
+            codes = {}
+            flat_codes = np.fromiter((codes.setdefault(food, len(codes)) for food in flat), dtype=np.int64,
+                                     count=len(flat))
+            unique = list(codes)
+            positions, rule_indexes, messages = [], [], []
+            for index, rule in enumerate(self.food_rules):
+                member = np.array([all(food in constants[name] for name in rule.foods) for food in unique],
+                                  dtype=bool)
+                found = np.flatnonzero(member[flat_codes]) if len(flat) else np.empty(0, dtype=np.int64)
+                hit_codes = flat_codes[found].tolist()
+                options = [self._food_options(rule, food, constants) for food in unique]
+                extra = {"food": [unique[code] for code in hit_codes], "options": [options[code] for code in hit_codes]}
+                messages.extend(zip(*(self._messages(template, constants, namespace, row_of[found], extra)
+                                      for template in rule.messages)))
+                positions.append(found)
+                rule_indexes.append(np.full(len(found), index))
+            positions, rule_indexes = np.concatenate(positions), np.concatenate(rule_indexes)
+            # Food order within each row, then rule order for the same food
+            order = np.lexsort((rule_indexes, positions))
+            for i, row, index in zip(order.tolist(), row_of[positions[order]].tolist(), rule_indexes[order].tolist()):
+                results[self.food_rules[index].group][row].extend(messages[i])
+
+        for rule, code in zip(self.rules, self._conditions):
+            fired = np.flatnonzero(_condition(code, namespace, rows))
+            group = results[rule.group]
+            per_template = [self._messages(template, constants, namespace, fired) for template in rule.messages]
+            for row, row_messages in zip(fired.tolist(), zip(*per_template)):
+                group[row].extend(row_messages)
+
+        for group, message in self.fallbacks.items():
+            for row_messages in results[group]:
+                if not row_messages:
+                    row_messages.append(message)
+        return results
+
+
+# NutritionAdvisor.calculate_recommendations: targets by steps
+ACTIVITY_TIERS = Tiers("activity_level", ("protein_target", "carb_target"), [
+    Tier("very_active", "steps > 10000", (80, 150)),
+    Tier("active", "steps > 7000", (70, 130)),
+    Tier("sedentary", "True", (60, 100)),
+])
+
+# HealthFoodAdvisor.set_user_profile: daily calorie target as a multiple of BMR by HbA1c
+HBA1C_BANDS = Tiers("hba1c_band", ("bmr_multiplier",), [
+    Tier("normal", "hba1c < 5.7", (1.2,)),
+    Tier("prediabetes", "hba1c <= 6.4", (1.1,)),
+    Tier("diabetes", "True", (1.0,)),
+])
+
+# NutritionAdvisor.calculate_recommendations; values are the meal's nutrition, steps and ACTIVITY_TIERS
+RECOMMENDATION_RULES = RuleSet([
+    Rule("additions", "protein < protein_target", (
+        "Add lean protein sources: chicken breast, fish, tofu, or Greek yogurt",
+        "Current protein: {protein}g, Target: {protein_target}g",
+    )),
+    Rule("deletions", "carbs > carb_target + 30", ("Consider reducing carbohydrates. Current: {carbs}g",)),
+    Rule("replacements", "glycemic_load > 50", ("Replace high-GI foods with low-GI alternatives",)),
+    Rule("general", "steps < 5000", ("Low activity level detected. Consider adding a walk after meals",)),
+])
+
+# NutritionAdvisor.suggest_meal_modifications; values are the meal's nutrition
+MODIFICATION_RULES = RuleSet([
+    FoodRule("modifications", ("high_gi_foods",), ("Replace {food} with lower GI alternative",)),
+    Rule("modifications", "protein < 50", ("Add protein source: chicken, fish, eggs, or legumes",)),
+    Rule("modifications", "fat < 20", ("Add healthy fats: avocado, nuts, or olive oil",)),
+], constants={"high_gi_foods": {"white bread", "white rice", "potato", "sugar"}})
+
+# HealthFoodAdvisor.get_health_suggestions; values are the meal's nutrition and the user profile
+HEALTH_RULES = RuleSet([
+    Rule("suggestions", "(hba1c >= 5.7) & (carbs > 30)", (
+        "Your meal is high in carbohydrates. Consider replacing some carbs with protein or vegetables.",
+    )),
+    Rule("suggestions", "calories > (daily_calorie_target - calories_consumed) * 0.5", (
+        "This meal is quite calorie-dense. You might want to consider a lighter option.",
+    )),
+    Rule("suggestions", "steps_today < 5000", (
+        "You haven't reached your step goal today. Try to take a walk after your meal.",
+    )),
+], fallbacks={"suggestions": "Your meal looks balanced. Keep up the good eating habits!"})
+
+# HealthFoodAdvisor.get_meal_replacement_suggestions; values are the meal's vegetable and protein food
+# counts, and the advisor passes its replacement_suggestions, protein_alternatives and salad_additions
+REPLACEMENT_RULES = RuleSet([
+    FoodRule("suggestions", ("high_carb_foods",), (
+        "Consider reducing {food} portion and adding {protein_alternatives[0]} or {protein_alternatives[1]} "
+        "for better protein balance.",
+    )),
+    FoodRule("suggestions", ("high_carb_foods", "replacement_suggestions"), (
+        "You could replace {food} with {options[0]} or {options[1]} for a healthier option.",
+    )),
+    Rule("suggestions", "vegetable_foods < 2", (
+        "Consider adding a salad with {salad_additions[0]}, {salad_additions[1]}, and {salad_additions[2]} "
+        "for more fiber and nutrients.",
+    )),
+    Rule("suggestions", "protein_foods == 0", (
+        "Your meal could use more protein. Consider adding {protein_alternatives[0]}, {protein_alternatives[1]}, "
+        "or {protein_alternatives[2]}.",
+    )),
+], constants={"high_carb_foods": {"rice", "pasta", "bread", "potato", "noodles"}})
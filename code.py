@@ -1,11 +1,18 @@
-import pandas as pd
-import numpy as np
+from collections import Counter, namedtuple
 from datetime import datetime
-import requests
 import json
 
+# Totals columns of bulk meal log analysis, in the order analyze_nutrition reports them
+TOTAL_COLUMNS = ['carbs', 'protein', 'fat', 'glycemic_load', 'calories']
+
+# Meal log rows processed per chunk by analyze_meal_log
+MEAL_LOG_CHUNK_SIZE = 500_000
+
+# Result of analyze_meal_log: per-meal and per-user/day totals DataFrames, and food name sets
+MealLogAnalysis = namedtuple('MealLogAnalysis', ['meals', 'daily', 'found_foods', 'missing_foods'])
+
 class NutritionAdvisor:
-    def __init__(self):
+    def __init__(self, food_store=None, meal_history=None, user_id='default'):
         # Nutritional database (simplified)
         self.food_db = {
             'apple': {'carbs': 25, 'protein': 0.5, 'fat': 0.3, 'glycemic_index': 36},
@@ -20,11 +27,20 @@ class NutritionAdvisor:
             'quinoa': {'carbs': 39, 'protein': 8, 'fat': 4, 'glycemic_index': 53}
         }
         
+        # A memory-mapped or shared store (path, FoodStore or SharedFoodStore) replaces the built-in foods without loading them
+        if food_store is not None:
+            from food_store import FoodStore
+            self.food_db = food_store if isinstance(food_store, FoodStore) else FoodStore(food_store)
+        
         self.user_data = {
             'steps': 0,
             'calories_burned': 0,
             'meal_history': []
         }
+        
+        # MealHistory that recorded meals are also appended to, under user_id
+        self.meal_history = meal_history
+        self.user_id = user_id
     
     def get_user_input(self):
         """Get food input from user"""
@@ -66,7 +82,8 @@ class NutritionAdvisor:
                 total_nutrition['carbs'] += nutrition['carbs']
                 total_nutrition['protein'] += nutrition['protein']
                 total_nutrition['fat'] += nutrition['fat']
-                total_nutrition['glycemic_load'] += nutrition['glycemic_index'] * nutrition['carbs'] / 100
+                # Built-in rows may have no glycemic index recorded
+                total_nutrition['glycemic_load'] += nutrition.get('glycemic_index', 0) * nutrition['carbs'] / 100
                 total_nutrition['calories'] += (nutrition['carbs'] * 4 + 
                                               nutrition['protein'] * 4 + 
                                               nutrition['fat'] * 9)
@@ -76,81 +93,146 @@ class NutritionAdvisor:
         
         return total_nutrition, found_foods, missing_foods
     
-    def calculate_recommendations(self, nutrition, steps, calories_burned):
-        """Generate personalized recommendations"""
-        recommendations = {
-            'additions': [],
-            'deletions': [],
-            'replacements': [],
-            'general': []
+    def record_meal(self, foods, meal_type=None):
+        """Analyze a meal and add it to user_data['meal_history'], and to meal_history when one is set"""
+        nutrition, found_foods, missing_foods = self.analyze_nutrition(foods)
+        entry = {
+            'time': datetime.now(),
+            'meal_type': meal_type,
+            'foods': dict(Counter(found_foods)),
+            'nutrition': nutrition
         }
+        self.user_data['meal_history'].append(entry)
+        
+        if self.meal_history is not None:
+            self.meal_history.log_meal(self.user_id, meal_type, nutrition, entry['foods'], logged_at=entry['time'])
+        
+        return nutrition, found_foods, missing_foods
+    
+    def food_table(self):
+        """Per-serving totals for every food as a DataFrame indexed by name, with glycemic load and calories precomputed"""
+        import numpy as np
+        import pandas as pd
         
-        # Activity-based adjustments
-        activity_level = 'sedentary'
-        if steps > 10000:
-            activity_level = 'very_active'
-            protein_target = 80
-            carb_target = 150
-        elif steps > 7000:
-            activity_level = 'active'
-            protein_target = 70
-            carb_target = 130
+        if hasattr(self.food_db, 'column_matrix'):
+            # A FoodStore: read its columns in place instead of materializing every row
+            carbs, protein, fat, gi = np.asarray(
+                self.food_db.column_matrix(('carbs', 'protein', 'fat', 'glycemic_index')), dtype=np.float64).T
+            names = list(self.food_db)
         else:
-            activity_level = 'sedentary'
-            protein_target = 60
-            carb_target = 100
-        
-        # Macronutrient analysis
-        if nutrition['protein'] < protein_target:
-            recommendations['additions'].extend([
-                'Add lean protein sources: chicken breast, fish, tofu, or Greek yogurt',
-                f'Current protein: {nutrition["protein"]}g, Target: {protein_target}g'
-            ])
-        
-        if nutrition['carbs'] > carb_target + 30:
-            recommendations['deletions'].append(
-                f'Consider reducing carbohydrates. Current: {nutrition["carbs"]}g'
-            )
+            names = list(self.food_db)
+            carbs, protein, fat, gi = (np.array([self.food_db[name].get(column, 0) for name in names], dtype=np.float64)
+                                       for column in ('carbs', 'protein', 'fat', 'glycemic_index'))
         
-        # Glycemic index analysis
-        if nutrition['glycemic_load'] > 50:
-            recommendations['replacements'].append(
-                'Replace high-GI foods with low-GI alternatives'
-            )
+        return pd.DataFrame({
+            'carbs': carbs,
+            'protein': protein,
+            'fat': fat,
+            'glycemic_load': gi * carbs / 100,
+            'calories': carbs * 4 + protein * 4 + fat * 9,
+        }, index=pd.Index(names, name='food'))
+    
+    def analyze_meal_log(self, meal_log, chunksize=MEAL_LOG_CHUNK_SIZE):
+        """Vectorized analyze_nutrition over a long-format meal log.
+
+        meal_log is a DataFrame, a CSV path, or an iterable of DataFrames
+        with user, timestamp (ISO 8601), food and optional quantity (servings, default
+        1) columns. Rows sharing a user and timestamp form one meal. It is
+        processed chunksize rows at a time against food_table(), so memory
+        grows with the number of meals rather than rows. Returns a
+        MealLogAnalysis with per-meal and per-user/day totals, including
+        item and missing-item counts, and the found and missing food names.
+        """
+        import numpy as np
+        import pandas as pd
         
-        # General health recommendations
-        if steps < 5000:
-            recommendations['general'].append(
-                'Low activity level detected. Consider adding a walk after meals'
-            )
+        if isinstance(meal_log, str):
+            chunks = pd.read_csv(meal_log, chunksize=chunksize)
+        elif isinstance(meal_log, pd.DataFrame):
+            chunks = (meal_log.iloc[start:start + chunksize] for start in range(0, len(meal_log), chunksize))
+        else:
+            chunks = meal_log
+        
+        table = self.food_table()
+        values = table[TOTAL_COLUMNS].to_numpy()
+        partials = []
+        found_foods = set()
+        missing_foods = set()
         
-        return recommendations, activity_level
+        for chunk in chunks:
+            foods = chunk['food'].astype(str)
+            rows = table.index.get_indexer(foods)
+            found = rows >= 0
+            quantity = (chunk['quantity'].to_numpy(dtype=np.float64) if 'quantity' in chunk
+                        else np.ones(len(chunk)))
+            
+            totals = pd.DataFrame(values[np.where(found, rows, 0)] * (quantity * found)[:, None],
+                                  columns=TOTAL_COLUMNS)
+            totals['items'] = found.astype(np.int64)
+            totals['missing'] = (~found).astype(np.int64)
+            totals['user'] = chunk['user'].to_numpy()
+            totals['timestamp'] = pd.to_datetime(chunk['timestamp'], format='ISO8601').to_numpy()
+            partials.append(totals.groupby(['user', 'timestamp'], sort=False).sum())
+            
+            unique_foods = pd.unique(foods)
+            unique_found = table.index.get_indexer(unique_foods) >= 0
+            found_foods.update(unique_foods[unique_found].tolist())
+            missing_foods.update(unique_foods[~unique_found].tolist())
+        
+        if partials:
+            # Meals split across chunk boundaries are merged here
+            meals = pd.concat(partials).groupby(level=['user', 'timestamp']).sum()
+        else:
+            meals = pd.DataFrame(columns=TOTAL_COLUMNS + ['items', 'missing'],
+                                 index=pd.MultiIndex.from_arrays([[], []], names=['user', 'timestamp']))
+        
+        by_day = meals.reset_index()
+        by_day['date'] = pd.to_datetime(by_day['timestamp']).dt.normalize()
+        daily = by_day.drop(columns='timestamp').groupby(['user', 'date']).sum()
+        daily['meals'] = by_day.groupby(['user', 'date']).size()
+        
+        return MealLogAnalysis(meals, daily, found_foods, missing_foods)
+    
+    def calculate_recommendations(self, nutrition, steps, calories_burned):
+        """Generate personalized recommendations from the activity tiers and rules in coaching_rules"""
+        from coaching_rules import ACTIVITY_TIERS, RECOMMENDATION_RULES
+        
+        tier = ACTIVITY_TIERS.evaluate_one({'steps': steps})
+        recommendations = RECOMMENDATION_RULES.evaluate_one({**nutrition, 'steps': steps, **tier})
+        return recommendations, tier['activity_level']
     
     def suggest_meal_modifications(self, foods, nutrition):
         """Suggest specific food modifications"""
-        modifications = []
+        from coaching_rules import MODIFICATION_RULES
         
-        # High GI food replacements
-        high_gi_foods = {'white bread', 'white rice', 'potato', 'sugar'}
-        for food in foods:
-            if food in high_gi_foods:
-                modifications.append(
-                    f"Replace {food} with lower GI alternative"
-                )
-        
-        # Protein optimization
-        if nutrition['protein'] < 50:
-            modifications.append(
-                "Add protein source: chicken, fish, eggs, or legumes"
-            )
+        return MODIFICATION_RULES.evaluate_one(nutrition, foods)['modifications']
+    
+    def batch_recommendations(self, frame):
+        """calculate_recommendations for every row of a DataFrame in one pass.
+
+        frame has protein, carbs, glycemic_load and steps columns, one row
+        per user or meal. Returns a DataFrame on frame's index with the
+        activity_level and one column of suggestion lists per group
+        (additions, deletions, replacements, general).
+        """
+        import pandas as pd
+        from coaching_rules import ACTIVITY_TIERS, RECOMMENDATION_RULES
         
-        # Healthy fats
-        if nutrition['fat'] < 20:
-            modifications.append(
-                "Add healthy fats: avocado, nuts, or olive oil"
-            )
+        columns = {name: frame[name].to_numpy() for name in ('protein', 'carbs', 'glycemic_load', 'steps')}
+        columns.update(ACTIVITY_TIERS.evaluate(columns))
+        recommendations = RECOMMENDATION_RULES.evaluate(columns)
+        return pd.DataFrame({'activity_level': columns['activity_level'], **recommendations}, index=frame.index)
+    
+    def batch_meal_modifications(self, frame, foods):
+        """suggest_meal_modifications for every row of a DataFrame with protein and fat columns.
+
+        foods holds each row's list of food names. Returns one list of
+        modifications per row.
+        """
+        from coaching_rules import MODIFICATION_RULES
         
-        return modifications
+        columns = {name: frame[name].to_numpy() for name in ('protein', 'fat')}
+        return MODIFICATION_RULES.evaluate(columns, foods)['modifications']
     
     def generate_meal_plan(self, foods, recommendations):
         """Generate optimized meal plan"""
@@ -186,8 +268,8 @@ class NutritionAdvisor:
             # Get smartwatch data
             steps, calories_burned = self.get_smartwatch_data()
             
-            # Analyze nutrition
-            nutrition, found_foods, missing_foods = self.analyze_nutrition(foods)
+            # Analyze nutrition and keep the meal in the history
+            nutrition, found_foods, missing_foods = self.record_meal(foods)
             
             # Generate recommendations
             recommendations, activity_level = self.calculate_recommendations(
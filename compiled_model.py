@@ -0,0 +1,200 @@
+"""Dependency-free inference for trained GlucosePredictor models.
+
+export_model flattens the selected model into plain NumPy arrays:
+    - tree ensembles (random forest, gradient boosting): every tree's nodes
+      concatenated into feature, threshold, left, right and value arrays,
+      with each tree's root index, plus the scaler's mean and scale.
+      Readings are standardized and rounded to float32 before comparison,
+      as scikit-learn's trees do, so splits land exactly where they did.
+    - linear models (linear regression, ridge): coefficients and intercept
+      with the scaler folded in
+The arrays are saved with np.savez (no pickle) and CompiledModel evaluates
+them with NumPy alone; scikit-learn is only needed to export. A one-feature
+tree ensemble is a step function of the reading, so CompiledModel also
+tabulates it once at load and answers single readings by binary search.
+    python compiled_model.py export glucose_model.joblib glucose_model.npz
+"""
+import argparse
+import bisect
+
+import numpy as np
+
+COMPILED_FORMAT = "ai-ninjas-compiled-glucose-model"
+COMPILED_FORMAT_VERSION = 1
+
+# Samples per batched tree traversal; bounds the (samples x trees) node index matrix
+TRAVERSAL_CHUNK = 4096
+
+
+def export_model(predictor):
+    """Flatten a trained GlucosePredictor's model and scaler into a dict of arrays"""
+    if not predictor.is_trained:
+        raise ValueError("Model must be trained before it can be exported")
+    model = predictor.model
+    mean = np.asarray(predictor.scaler.mean_, dtype=np.float64)
+    scale = np.asarray(predictor.scaler.scale_, dtype=np.float64)
+    arrays = {
+        "format": np.array(COMPILED_FORMAT),
+        "format_version": np.array(COMPILED_FORMAT_VERSION),
+        "model_name": np.array(predictor.model_name or type(model).__name__),
+        "n_features": np.array(len(mean)),
+    }
+
+    if hasattr(model, "coef_"):
+        # coef . (x - mean) / scale + b  ==  (coef / scale) . x + (b - coef . mean / scale)
+        coef = np.asarray(model.coef_, dtype=np.float64).reshape(-1) / scale
+        arrays.update(kind=np.array("linear"), coef=coef,
+                      intercept=np.array(float(model.intercept_) - coef @ mean))
+        return arrays
+
+    if hasattr(model, "learning_rate"):
+        # Gradient boosting: init + learning_rate * sum of tree outputs
+        trees = [estimator.tree_ for estimator in np.asarray(model.estimators_).reshape(-1)]
+        init = 0.0 if model.init_ == "zero" else float(model.init_.predict(np.zeros((1, len(mean))))[0])
+        offset, tree_scale = init, float(model.learning_rate)
+    elif hasattr(model, "estimators_"):
+        # Random forest: mean of tree outputs
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offset, tree_scale = 0.0, 1.0 / len(trees)
+    else:
+        raise ValueError(f"Cannot compile a {type(model).__name__}")
+
+    roots, features, thresholds, lefts, rights, values = [], [], [], [], [], []
+    start = 0
+    for tree in trees:
+        leaf = tree.children_left == -1
+        roots.append(start)
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(np.where(leaf, np.inf, tree.threshold))
+        lefts.append(np.where(leaf, -1, tree.children_left + start))
+        rights.append(np.where(leaf, -1, tree.children_right + start))
+        values.append(tree.value.reshape(tree.node_count, -1)[:, 0])
+        start += tree.node_count
+
+    arrays.update(
+        kind=np.array("trees"),
+        input_mean=mean,
+        input_scale=scale,
+        offset=np.array(offset),
+        tree_scale=np.array(tree_scale),
+        roots=np.array(roots, dtype=np.int64),
+        max_depth=np.array(max(tree.max_depth for tree in trees)),
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        left=np.concatenate(lefts).astype(np.int64),
+        right=np.concatenate(rights).astype(np.int64),
+        value=np.concatenate(values).astype(np.float64),
+    )
+    return arrays
+
+
+def save_compiled(predictor, path):
+    """Export a trained GlucosePredictor to an .npz file"""
+    np.savez(path, **export_model(predictor))
+
+
+class CompiledModel:
+    """Evaluator for exported model arrays; needs only NumPy"""
+
+    def __init__(self, arrays):
+        if str(arrays["format"]) != COMPILED_FORMAT or int(arrays["format_version"]) != COMPILED_FORMAT_VERSION:
+            raise ValueError(f"Not a version {COMPILED_FORMAT_VERSION} compiled glucose model")
+        self.kind = str(arrays["kind"])
+        self.model_name = str(arrays["model_name"])
+        self.n_features = int(arrays["n_features"])
+        self.steps = None
+
+        if self.kind == "linear":
+            self.coef = np.asarray(arrays["coef"])
+            self.intercept = float(arrays["intercept"])
+            self._coef = self.coef.tolist()
+            return
+
+        self.input_mean = np.asarray(arrays["input_mean"])
+        self.input_scale = np.asarray(arrays["input_scale"])
+        self._mean, self._scale = float(self.input_mean[0]), float(self.input_scale[0])
+        self.offset = float(arrays["offset"])
+        self.tree_scale = float(arrays["tree_scale"])
+        self.roots = np.asarray(arrays["roots"])
+        self.max_depth = int(arrays["max_depth"])
+        self.feature = np.asarray(arrays["feature"])
+        self.threshold = np.asarray(arrays["threshold"])
+        self.value = np.asarray(arrays["value"])
+        # Leaves point at themselves so a fixed number of steps reaches every leaf
+        nodes = np.arange(len(self.value))
+        left = np.asarray(arrays["left"])
+        right = np.asarray(arrays["right"])
+        self.left = np.where(left < 0, nodes, left)
+        self.right = np.where(right < 0, nodes, right)
+
+        if self.n_features == 1:
+            # Split points of every tree; the ensemble is constant between neighbours.
+            # Each interval is evaluated at the largest float32 not above its cut.
+            cuts = np.unique(self.threshold[np.isfinite(self.threshold)])
+            below = cuts.astype(np.float32)
+            below = np.where(below > cuts, np.nextafter(below, np.float32(-np.inf)), below)
+            # Plus one point above the last cut
+            above = np.float32(cuts[-1] if len(cuts) else 0.0)
+            if len(cuts) and above <= cuts[-1]:
+                above = np.nextafter(above, np.float32(np.inf))
+            points = np.append(below, above).astype(np.float32)
+            self.steps = (cuts.tolist(), self._traverse(points.reshape(-1, 1)).tolist())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def _standardize(self, X):
+        return ((X - self.input_mean) / self.input_scale).astype(np.float32)
+
+    def _traverse(self, X):
+        """Walk every tree for a block of standardized float32 samples at once"""
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.offset + self.tree_scale * self.value[nodes].sum(axis=1)
+
+    def predict(self, sensor_readings):
+        """Predictions for an array of readings (or an (n, n_features) array) as float64"""
+        X = np.asarray(sensor_readings, dtype=np.float64).reshape(-1, self.n_features)
+        if self.kind == "linear":
+            return X @ self.coef + self.intercept
+        X = self._standardize(X)
+        if self.steps is not None:
+            cuts, values = self.steps
+            return np.asarray(values)[np.searchsorted(cuts, X[:, 0], side="left")]
+        return np.concatenate([self._traverse(X[start:start + TRAVERSAL_CHUNK])
+                               for start in range(0, len(X), TRAVERSAL_CHUNK)] or [np.empty(0)])
+
+    def predict_one(self, sensor_reading):
+        """Prediction for a single one-feature reading, in pure Python"""
+        if self.kind == "linear":
+            return self._coef[0] * sensor_reading + self.intercept
+        if self.steps is not None:
+            cuts, values = self.steps
+            scaled = float(np.float32((sensor_reading - self._mean) / self._scale))
+            return values[bisect.bisect_left(cuts, scaled)]
+        return float(self.predict([sensor_reading])[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a saved glucose model for dependency-free inference")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="convert a GlucosePredictor artifact to an .npz file")
+    export.add_argument("model_path")
+    export.add_argument("output_path")
+    args = parser.parse_args()
+
+    from AI_predictor1 import GlucosePredictor
+
+    predictor = GlucosePredictor()
+    predictor.load_model(args.model_path)
+    save_compiled(predictor, args.output_path)
+    print(f"Compiled {predictor.model_name} to {args.output_path}")
+
+
+if __name__ == "__main__":
+    main()
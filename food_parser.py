@@ -0,0 +1,246 @@
+import re
+from collections import namedtuple
+
+from fuzzy_index import NGramIndex
+
+# Numbers (with optional decimal or fraction part) and runs of letters.
+# Splitting "2idlis" into "2" and "idlis" keeps quantities glued to food names.
+TOKEN_RE = re.compile(r"\d+(?:\.\d+|/\d+)?|[^\W\d]+")
+
+# Trie key marking the end of a phrase (tokens are never None)
+_END = None
+
+# Spelled-out quantities; consecutive numbers multiply ("half a dozen" -> 6)
+WORD_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "fifteen": 15, "twenty": 20, "dozen": 12, "couple of": 2,
+    "half": 0.5, "quarter": 0.25,
+}
+
+# Vague quantities, applied only to the food they precede
+VAGUE_QUANTITIES = {
+    "some": 0.5, "a little": 0.5, "a bit of": 0.5, "bit of": 0.5,
+    "a lot of": 2, "lots of": 2, "plenty of": 2,
+}
+
+# Words allowed between a quantity and its food ("2 cups of tea")
+GLUE_WORDS = {"of"}
+
+# Shorter words are never fuzzy-matched; too many short words look alike
+MIN_FUZZY_LENGTH = 4
+
+# One parsed mention: the count, the unit words (or None), the food and the
+# resulting number of servings once unit multipliers are applied
+FoodItem = namedtuple("FoodItem", ["quantity", "unit", "food", "servings"])
+
+
+class PhraseTrie:
+    """Trie over token sequences with leftmost-longest matching"""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, phrase, value):
+        tokens = TOKEN_RE.findall(phrase.lower())
+        if not tokens:
+            return
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[_END] = value
+
+    def match_at(self, text, tokens, i):
+        """Return (end_index, value) for the longest phrase starting at token i, or None"""
+        node = self.root
+        best = None
+        j = i
+        while j < len(tokens):
+            token, start, _ = tokens[j]
+            # Multi-word phrases only match across plain whitespace
+            if j > i and not text[tokens[j - 1][2]:start].isspace():
+                break
+            node = node.get(token)
+            if node is None:
+                break
+            j += 1
+            if _END in node:
+                best = (j, node[_END])
+        return best
+
+
+def _parse_number(token):
+    """Convert a numeric token ("2", "1.5", "1/2") to a number, or None"""
+    if not token[0].isdigit():
+        return None
+    if "/" in token:
+        numerator, denominator = token.split("/")
+        return int(numerator) / int(denominator) if int(denominator) else None
+    if "." in token:
+        return float(token)
+    return int(token)
+
+
+class FoodMatcher:
+    """Food, synonym and quantity grammar, built once and run in a single left-to-right pass"""
+
+    def __init__(self, food_database, synonyms, units, fuzzy_threshold=0.55):
+        self.food_database = food_database
+        self.synonyms = dict(synonyms)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.foods = PhraseTrie()
+        self.quantities = PhraseTrie()
+        self.units = dict(units)
+
+        # Synonyms first so a food spelled the same way always wins
+        for synonym, standard in synonyms.items():
+            self.foods.insert(synonym, standard)
+        if hasattr(food_database, "match_at"):
+            # On-disk tables (FoodStore) look names up themselves; only synonyms go in the trie
+            self.food_table = food_database
+        else:
+            self.food_table = None
+            for food in food_database:
+                self.foods.insert(food, food)
+
+        # Fallback-pass lookups, built on first use since they cover every food
+        self._partial_words = None
+        self._fuzzy_index = None
+
+        for unit in units:
+            self.quantities.insert(unit, ("unit", unit))
+        for word, value in WORD_NUMBERS.items():
+            self.quantities.insert(word, ("number", value))
+        for phrase, value in VAGUE_QUANTITIES.items():
+            self.quantities.insert(phrase, ("vague", value))
+
+    @property
+    def partial_words(self):
+        """Words of multi-word foods -> those foods"""
+        if self._partial_words is None:
+            partial_words = {}
+            for food in self.food_database:
+                words = food.split()
+                if len(words) > 1:
+                    for word in words:
+                        partial_words.setdefault(word, []).append(food)
+            self._partial_words = partial_words
+        return self._partial_words
+
+    @property
+    def fuzzy_index(self):
+        """N-gram index over food names and synonyms for misspellings ("chiken", "brocoli")"""
+        if self._fuzzy_index is None:
+            self._fuzzy_index = NGramIndex(
+                [(food, food) for food in self.food_database]
+                + [(synonym, standard) for synonym, standard in self.synonyms.items()
+                   if standard in self.food_database],
+                threshold=self.fuzzy_threshold,
+            )
+        return self._fuzzy_index
+
+    def _match_food(self, text, tokens, i):
+        """Longest food or synonym match at token i; on a tie the food name wins"""
+        match = self.foods.match_at(text, tokens, i)
+        if self.food_table is not None:
+            table_match = self.food_table.match_at(text, tokens, i)
+            if table_match and (match is None or table_match[0] >= match[0]):
+                return table_match
+        return match
+
+    @staticmethod
+    def tokenize(text):
+        """Split lowercase text into (token, start, end) triples"""
+        return [(m.group(), m.start(), m.end()) for m in TOKEN_RE.finditer(text)]
+
+    def suggest(self, term, limit=5, threshold=None):
+        """Return ranked (food, matched_name, score) fuzzy candidates for a possibly misspelled name"""
+        return self.fuzzy_index.search(term, limit, threshold)
+
+    def parse(self, text, fuzzy=False):
+        """Return a FoodItem for every food mentioned in lowercase text, in order.
+
+        A quantity ("2", "half a", "1 1/2", "some") and unit words ("large bowls")
+        attach to the food that directly follows them; any other word or
+        punctuation in between drops them. With fuzzy=True, single words of
+        multi-word food names and close misspellings of food names also count
+        as mentions.
+        """
+        tokens = self.tokenize(text)
+        items = []
+        quantity = None
+        unit_words = []
+        multiplier = 1
+        previous_digit = False
+        fuzzy_end = None
+        i = 0
+        while i < len(tokens):
+            token, start, _ = tokens[i]
+
+            # Punctuation between tokens ends any pending quantity
+            if i and text[tokens[i - 1][2]:start].strip():
+                quantity, unit_words, multiplier, previous_digit = None, [], 1, False
+
+            food_match = self._match_food(text, tokens, i)
+            if food_match:
+                end, food = food_match
+                foods = [food]
+            else:
+                number = _parse_number(token)
+                if number is not None:
+                    # A digit fraction after a digit integer adds ("1 1/2"); otherwise numbers multiply
+                    if quantity is None:
+                        quantity = number
+                    elif previous_digit and "/" in token:
+                        quantity += number
+                    else:
+                        quantity *= number
+                    previous_digit = True
+                    i += 1
+                    continue
+                previous_digit = False
+
+                quantity_match = self.quantities.match_at(text, tokens, i)
+                if quantity_match:
+                    end, (kind, value) = quantity_match
+                    if kind == "unit":
+                        unit_words.append(value)
+                        multiplier *= self.units[value]
+                    elif kind == "vague":
+                        quantity = value
+                    else:
+                        quantity = value if quantity is None else quantity * value
+                    i = end
+                    continue
+
+                foods = self._fuzzy_foods(token) if fuzzy and token not in GLUE_WORDS else []
+                if not foods:
+                    if token not in GLUE_WORDS:
+                        quantity, unit_words, multiplier = None, [], 1
+                    i += 1
+                    continue
+                # Adjacent words of the same food ("ice-cream", "ice creem") are one mention
+                if fuzzy_end == i and items:
+                    foods = [food for food in foods if food != items[-1].food]
+                end = fuzzy_end = i + 1
+
+            count = 1 if quantity is None else quantity
+            unit = " ".join(unit_words) or None
+            for food in foods:
+                items.append(FoodItem(count, unit, food, count * multiplier))
+            quantity, unit_words, multiplier, previous_digit = None, [], 1, False
+            i = end
+
+        return items
+
+    def _fuzzy_foods(self, token):
+        """Foods an unrecognised word may refer to: a word of a multi-word name, else the best fuzzy match"""
+        if token in self.partial_words:
+            return self.partial_words[token]
+        if len(token) < MIN_FUZZY_LENGTH:
+            return []
+        # A single word only stands for a single-word name; "curry" is not "fish curry"
+        for food, name, _ in self.fuzzy_index.search(token):
+            if " " not in name:
+                return [food]
+        return []
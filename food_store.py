@@ -0,0 +1,373 @@
+"""Memory-mapped columnar food database.
+
+A store is a directory of NumPy arrays written once by an offline
+conversion from CSV and opened with mmap, so opening it costs the same for
+ten foods or a million, and worker processes share its pages. Rows are
+only turned into dicts when they are looked up.
+
+Convert a CSV with a header of name, calories, carbs, protein, fat,
+glycemic_index, category into a store; an empty or missing numeric cell is
+stored as 0.0, so lookups, matrix products and bulk analysis all agree:
+    python food_store.py build foods.csv foods.store
+Write the advisors' built-in tables as such a CSV:
+    python food_store.py export-builtin foods.csv
+SharedFoodStore holds the same columns in one named shared memory block,
+published by a parent process and attached to by its workers.
+"""
+import argparse
+import bisect
+import csv
+import json
+import mmap
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+from food_parser import TOKEN_RE
+from parse_cache import VersionedDict
+
+FORMAT = "ai-ninjas-food-store"
+# Version 2 stores missing numeric cells as 0.0 rather than NaN
+FORMAT_VERSION = 2
+
+# Numeric columns in file order; the first four form HealthFoodAdvisor's nutrient matrix
+NUMERIC_COLUMNS = ("calories", "carbs", "protein", "fat", "glycemic_index")
+
+# Arrays of a store, saved as <name>.npy
+ARRAYS = ("numeric", "category", "name_offsets", "name_order")
+
+# Alignment of each array in a shared memory block
+SHARED_ALIGNMENT = 64
+
+
+def normalize_name(name):
+    """Lowercase name with tokens joined by single spaces, as the chat matcher sees it"""
+    return " ".join(TOKEN_RE.findall(name.lower()))
+
+
+def _number(value):
+    """Float for a numeric cell; missing, empty and NaN cells are 0.0"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return 0.0
+    value = float(value)
+    return 0.0 if value != value else value
+
+
+def encode_records(records):
+    """Metadata, column arrays and concatenated UTF-8 names for dicts with a name key and store columns"""
+    names = []
+    seen = set()
+    values = []
+    categories = {}
+    category_codes = []
+
+    for record in records:
+        name = normalize_name(record["name"])
+        if not name or name in seen:
+            continue
+        seen.add(name)
+        names.append(name)
+        values.append([_number(record.get(column)) for column in NUMERIC_COLUMNS])
+        category = str(record.get("category") or "").strip()
+        category_codes.append(categories.setdefault(category, len(categories)))
+
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(name) for name in encoded])
+    arrays = {
+        "numeric": np.array(values, dtype=np.float64).reshape(len(names), len(NUMERIC_COLUMNS)),
+        "category": np.array(category_codes, dtype=np.int32),
+        "name_offsets": offsets,
+        # Rows sorted by UTF-8 name bytes, for binary-search lookups
+        "name_order": np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=np.int64),
+    }
+    meta = {
+        "format": FORMAT,
+        "format_version": FORMAT_VERSION,
+        "rows": len(names),
+        "numeric_columns": list(NUMERIC_COLUMNS),
+        "categories": list(categories),
+        "max_name_tokens": max((len(name.split()) for name in names), default=0),
+    }
+    return meta, arrays, b"".join(encoded)
+
+
+def build_store(csv_path, store_path):
+    """Convert a food CSV into a columnar store directory; return the number of rows written"""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        meta, arrays, names = encode_records(csv.DictReader(f))
+
+    os.makedirs(store_path, exist_ok=True)
+    with open(os.path.join(store_path, "names.bin"), "wb") as f:
+        f.write(names)
+    for name, array in arrays.items():
+        np.save(os.path.join(store_path, f"{name}.npy"), array)
+    with open(os.path.join(store_path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta["rows"]
+
+
+class _SortedNames:
+    """Sequence view of the names in sorted order, for bisect"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, i):
+        return self.store._name_bytes(int(self.store.name_order[i]))
+
+
+class FoodStore(Mapping):
+    """Read-only food name -> nutrition dict mapping over a memory-mapped store"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT or meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} food store")
+
+        self.path = path
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        with open(os.path.join(path, "names.bin"), "rb") as f:
+            names = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if meta["rows"] else b""
+        self._attach(meta, arrays, names)
+
+    def _attach(self, meta, arrays, names):
+        self.rows = meta["rows"]
+        self.numeric_columns = tuple(meta["numeric_columns"])
+        self.categories = meta["categories"]
+        self.max_name_tokens = meta["max_name_tokens"]
+        # Never changes, so caches keyed on table versions stay valid
+        self.version = VersionedDict().version
+
+        self.numeric = arrays["numeric"]
+        self.category_codes = arrays["category"]
+        self.name_offsets = arrays["name_offsets"]
+        self.name_order = arrays["name_order"]
+        self._names = names
+        self._sorted_names = _SortedNames(self)
+
+    def _name_bytes(self, row):
+        return self._names[int(self.name_offsets[row]):int(self.name_offsets[row + 1])]
+
+    def name_at(self, row):
+        return self._name_bytes(row).decode("utf-8")
+
+    def row_of(self, name):
+        """Row number of a food name, or None"""
+        key = name.encode("utf-8")
+        i = bisect.bisect_left(self._sorted_names, key)
+        if i < self.rows and self._sorted_names[i] == key:
+            return int(self.name_order[i])
+        return None
+
+    def row_dict(self, row):
+        """Materialize one row as a nutrition dict with every numeric column"""
+        record = dict(zip(self.numeric_columns, self.numeric[row].tolist()))
+        record["category"] = self.categories[int(self.category_codes[row])]
+        return record
+
+    def __getitem__(self, name):
+        row = self.row_of(name)
+        if row is None:
+            raise KeyError(name)
+        return self.row_dict(row)
+
+    def __contains__(self, name):
+        return isinstance(name, str) and self.row_of(name) is not None
+
+    def __iter__(self):
+        for row in range(self.rows):
+            yield self.name_at(row)
+
+    def __len__(self):
+        return self.rows
+
+    def column_matrix(self, columns):
+        """Memory-mapped (rows, len(columns)) view when the columns are contiguous, else a copy"""
+        positions = [self.numeric_columns.index(column) for column in columns]
+        if positions == list(range(positions[0], positions[0] + len(positions))):
+            return self.numeric[:, positions[0]:positions[-1] + 1]
+        return np.asarray(self.numeric[:, positions])
+
+    def match_at(self, text, tokens, i):
+        """PhraseTrie-compatible longest food-name match starting at token i"""
+        end = i
+        while end < len(tokens) and end - i < self.max_name_tokens:
+            if end > i and not text[tokens[end - 1][2]:tokens[end][1]].isspace():
+                break
+            end += 1
+        for j in range(end, i, -1):
+            phrase = " ".join(token for token, _, _ in tokens[i:j])
+            if self.row_of(phrase) is not None:
+                return j, phrase
+        return None
+
+
+def _shared_memory(name, size=0):
+    """Create a shared memory block of size bytes, or attach to an existing one when size is 0"""
+    from multiprocessing import shared_memory
+
+    if size:
+        return shared_memory.SharedMemory(name, create=True, size=size)
+    try:
+        # Python 3.13+: leave cleanup to the creator instead of this process's resource tracker
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name)
+
+
+def _map_shared_memory(name):
+    """Block name and a read-only mapping of it that outlives the SharedMemory handle"""
+    shm = _shared_memory(name)
+    try:
+        if getattr(shm, "_fd", -1) >= 0:
+            mapping = mmap.mmap(shm._fd, shm.size, access=mmap.ACCESS_READ)
+        else:
+            # Windows names the mapping instead of handing out a descriptor
+            mapping = mmap.mmap(-1, shm.size, tagname=shm.name, access=mmap.ACCESS_READ)
+    finally:
+        shm.close()
+    return shm.name, mapping
+
+
+def _aligned(offset):
+    return -(-offset // SHARED_ALIGNMENT) * SHARED_ALIGNMENT
+
+
+class SharedFoodStore(FoodStore):
+    """FoodStore held in one named, read-only shared memory block.
+
+    create() publishes a table once, by default the advisors' built-in
+    foods with HealthFoodAdvisor's synonyms and units, and worker processes
+    attach to it by name. Their arrays are views of the same physical pages,
+    so no worker copies the table and no reference count is ever written
+    into it. Pickles as its name, so it can be passed to pool workers. The
+    creating process owns the block and unlinks it when done; before Python
+    3.13, attach only from processes it started, which share its resource
+    tracker, or the block is unlinked when the first of them exits.
+    """
+
+    def __init__(self, name):
+        self.name, self._mapping = _map_shared_memory(name)
+        self.path = self.name
+        self.owner = False
+        header = int.from_bytes(self._mapping[:8], "little")
+        meta = json.loads(self._mapping[8:8 + header])
+        if meta.get("format") != FORMAT or meta.get("format_version") != FORMAT_VERSION:
+            self._mapping.close()
+            raise ValueError(f"Shared memory block {name} is not a version {FORMAT_VERSION} food store")
+
+        # Arrays are views of the mapping, which stays open while any of them is alive
+        base = _aligned(8 + header)
+        arrays = {key: np.ndarray(shape, dtype=dtype, buffer=self._mapping, offset=base + offset)
+                  for key, (offset, dtype, shape) in meta["arrays"].items()}
+        start, end = meta["names"]
+        self._attach(meta, arrays, memoryview(self._mapping)[base + start:base + end])
+        self.synonyms = meta["synonyms"]
+        self.units = meta["units"]
+
+    @classmethod
+    def create(cls, records=None, synonyms=None, units=None, name=None):
+        """Publish food records (dicts with a name key and store columns) and attach to them as the owner"""
+        if records is None:
+            records = builtin_records()
+        if synonyms is None or units is None:
+            from LLM import HealthFoodAdvisor
+
+            advisor = HealthFoodAdvisor()
+            synonyms = advisor.synonyms if synonyms is None else synonyms
+            units = advisor.units if units is None else units
+
+        meta, arrays, names = encode_records(records)
+        # Offsets are relative to the first aligned byte after the header
+        meta["arrays"] = {}
+        offset = 0
+        for key, array in arrays.items():
+            meta["arrays"][key] = [offset, array.dtype.str, list(array.shape)]
+            offset = _aligned(offset + array.nbytes)
+        meta["names"] = [offset, offset + len(names)]
+        meta["synonyms"] = dict(synonyms)
+        meta["units"] = dict(units)
+        header = json.dumps(meta).encode("utf-8")
+        base = _aligned(8 + len(header))
+
+        shm = _shared_memory(name, size=base + offset + len(names))
+        shm.buf[:8] = len(header).to_bytes(8, "little")
+        shm.buf[8:8 + len(header)] = header
+        for key, array in arrays.items():
+            start = base + meta["arrays"][key][0]
+            shm.buf[start:start + array.nbytes] = array.tobytes()
+        shm.buf[base + offset:base + offset + len(names)] = names
+        store = cls(shm.name)
+        shm.close()
+        store.owner = True
+        return store
+
+    def __reduce__(self):
+        return SharedFoodStore, (self.name,)
+
+    def _name_bytes(self, row):
+        return bytes(super()._name_bytes(row))
+
+    def close(self):
+        """Unmap the block now rather than with its last view; release views handed out (column_matrix) first"""
+        self.numeric = self.category_codes = self.name_offsets = self.name_order = None
+        self._names.release()
+        self._mapping.close()
+
+    def unlink(self):
+        """Remove the block's name, once, from the owner; processes already attached keep their mapping"""
+        _shared_memory(self.name).unlink()
+
+
+def builtin_records():
+    """The built-in HealthFoodAdvisor and NutritionAdvisor foods as store records"""
+    from LLM import HealthFoodAdvisor
+    from code import NutritionAdvisor
+
+    rows = {}
+    for name, info in HealthFoodAdvisor().food_database.items():
+        rows[name] = dict(info, name=name)
+    for name, info in NutritionAdvisor().food_db.items():
+        row = rows.setdefault(name, {"name": name})
+        for column, value in info.items():
+            row.setdefault(column, value)
+        # NutritionAdvisor estimates calories from macros
+        row.setdefault("calories", info["carbs"] * 4 + info["protein"] * 4 + info["fat"] * 9)
+    return list(rows.values())
+
+
+def export_builtin(csv_path):
+    """Write the built-in HealthFoodAdvisor and NutritionAdvisor foods as a store CSV"""
+    rows = builtin_records()
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=("name",) + NUMERIC_COLUMNS + ("category",))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and inspect columnar food stores")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="convert a food CSV into a store directory")
+    build.add_argument("csv_path")
+    build.add_argument("store_path")
+    export = commands.add_parser("export-builtin", help="write the built-in food tables as CSV")
+    export.add_argument("csv_path")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"Wrote {build_store(args.csv_path, args.store_path)} foods to {args.store_path}")
+    else:
+        print(f"Wrote {export_builtin(args.csv_path)} foods to {args.csv_path}")
+
+
+if __name__ == "__main__":
+    main()
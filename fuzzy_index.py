@@ -0,0 +1,64 @@
+from collections import Counter
+
+
+def ngrams(text, n=3):
+    """Set of character n-grams of text, padded with one space on each side"""
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+class NGramIndex:
+    """Character n-gram inverted index for ranked fuzzy lookups of food names.
+
+    A lookup only visits the posting lists of the query's own n-grams, so its
+    cost depends on how many names share n-grams with the query rather than on
+    the size of the database. Candidates are scored with the Dice coefficient
+    of their n-gram sets.
+    """
+
+    def __init__(self, entries, n=3, threshold=0.55):
+        self.n = n
+        self.threshold = threshold
+        self.names = []
+        self.targets = []
+        self.sizes = []
+        self.postings = {}
+
+        # entries are (name, target) pairs, e.g. a synonym and its standard food
+        for name, target in entries:
+            grams = ngrams(name.lower(), n)
+            entry = len(self.names)
+            self.names.append(name)
+            self.targets.append(target)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(entry)
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, term, limit=5, threshold=None):
+        """Return up to limit (target, name, score) candidates at or above threshold, best first"""
+        if threshold is None:
+            threshold = self.threshold
+        grams = ngrams(term.lower(), self.n)
+
+        shared = Counter()
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings:
+                shared.update(postings)
+
+        # Keep the best-scoring name for each target
+        best = {}
+        size = len(grams)
+        for entry, count in shared.items():
+            score = 2 * count / (size + self.sizes[entry])
+            if score < threshold:
+                continue
+            target = self.targets[entry]
+            if target not in best or score > best[target][2]:
+                best[target] = (target, self.names[entry], score)
+
+        ranked = sorted(best.values(), key=lambda candidate: (-candidate[2], candidate[1]))
+        return ranked[:limit]
@@ -0,0 +1,59 @@
+import re
+from collections import namedtuple
+
+# intent is "glucose", "steps" or "meal"; steps and meal_type are the extracted slots
+Route = namedtuple("Route", ["intent", "steps", "meal_type"])
+
+GLUCOSE_KEYWORDS = ("sensor", "glucose")
+
+# Words that only name a meal when no meal pattern matched ("my first plate")
+FALLBACK_MEAL_KEYWORDS = {"first": "breakfast"}
+
+STEP_COUNT_RE = re.compile(r"(\d+)\s*steps?")
+
+
+class IntentRouter:
+    """Precompiled classifier for chat messages.
+
+    The keyword tables are flattened once into priority order: glucose
+    keywords, then a step count when "steps" is present, then meal keywords
+    in meal_patterns order followed by the fallback words. Routing lowercases
+    the message once and runs C-level substring checks down that list,
+    stopping at the first hit, so keywords keep the old substring semantics
+    ("tonight" is dinner) and the old priorities.
+    """
+
+    def __init__(self, meal_patterns):
+        self.meal_keywords = []
+        seen = set()
+        for meal_type, patterns in meal_patterns.items():
+            for pattern in patterns:
+                if pattern not in seen:
+                    seen.add(pattern)
+                    self.meal_keywords.append((pattern, meal_type))
+        for keyword, meal_type in FALLBACK_MEAL_KEYWORDS.items():
+            if keyword not in seen:
+                seen.add(keyword)
+                self.meal_keywords.append((keyword, meal_type))
+
+    def meal_type(self, text):
+        """Meal type named in lowercase text, or None"""
+        for keyword, meal_type in self.meal_keywords:
+            if keyword in text:
+                return meal_type
+        return None
+
+    def route(self, user_input):
+        """Classify a message and extract its step count and meal type"""
+        text = user_input.lower()
+
+        for keyword in GLUCOSE_KEYWORDS:
+            if keyword in text:
+                return Route("glucose", None, None)
+
+        if "steps" in text:
+            step_match = STEP_COUNT_RE.search(text)
+            if step_match:
+                return Route("steps", int(step_match.group(1)), None)
+
+        return Route("meal", None, self.meal_type(text))
@@ -0,0 +1,331 @@
+"""Streaming IR sensor ingestion with windowed glucose prediction.
+
+Samples arrive from a source in blocks and are written into a fixed-size
+NumPy ring buffer, so memory stays bounded however long the stream runs.
+Every hop samples, the latest window is cleaned (robust z-score outlier
+rejection, then a moving average) and scored in one
+GlucosePredictor.predict_glucose_batch call; the window's estimate is the
+median prediction. Simulate a 200 Hz sensor for ten seconds:
+    python ir_stream.py --simulate --rate 200 --seconds 10
+Replay a recording (.npy, or text with one reading per line) as fast as possible:
+    python ir_stream.py --replay readings.csv
+"""
+import argparse
+import itertools
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+# One scored window: end_sample counts samples since the stream started and
+# latency_ms runs from the arrival of the window's last sample to its prediction
+WindowResult = namedtuple("WindowResult", ["index", "end_sample", "glucose", "reading", "rejected", "latency_ms"])
+
+# Recent window latencies kept for percentile metrics
+LATENCY_HISTORY = 1024
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of the most recent samples"""
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.total = 0  # samples ever written
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype).reshape(-1)
+        count = len(values)
+        # Only the newest capacity samples can survive the write
+        values = values[-self.capacity:]
+        start = (self.total + count - len(values)) % self.capacity
+        first = min(len(values), self.capacity - start)
+        self.data[start:start + first] = values[:first]
+        self.data[:len(values) - first] = values[first:]
+        self.total += count
+
+    def latest(self, n):
+        """Copy of the newest n samples, oldest first"""
+        if n > len(self):
+            raise ValueError(f"Only {len(self)} samples buffered, asked for {n}")
+        end = self.total % self.capacity
+        if n <= end:
+            return self.data[end - n:end].copy()
+        return np.concatenate((self.data[end - n:], self.data[:end]))
+
+
+class SampleSource:
+    """Base class for IR sample sources.
+
+    Subclasses implement _next(count), returning up to count readings as an
+    array and an empty array once exhausted. With rate_hz set, read() paces
+    delivery to that many samples per second of wall-clock time.
+    """
+
+    def __init__(self, rate_hz=None):
+        self.rate_hz = rate_hz
+        self.delivered = 0
+        self.dropped = 0  # unreadable samples skipped by the source
+        self._started = None
+        self.exhausted = False
+
+    def read(self, max_samples):
+        """Next block of readings; None once the source is exhausted"""
+        if self.exhausted:
+            return None
+        count = max_samples
+        if self.rate_hz:
+            now = time.perf_counter()
+            if self._started is None:
+                self._started = now
+            due = int((now - self._started) * self.rate_hz) - self.delivered
+            if due <= 0:
+                time.sleep((1 - due) / self.rate_hz)
+                due = 1
+            count = min(count, due)
+        block = self._next(count)
+        if not len(block):
+            self.exhausted = True
+            return None
+        self.delivered += len(block)
+        return block
+
+    def _next(self, count):
+        raise NotImplementedError
+
+
+class SimulatedSource(SampleSource):
+    """Synthetic IR readings: a slow drift plus noise and occasional spikes"""
+
+    def __init__(self, rate_hz=200, seconds=None, realtime=True, baseline=175.0, drift=8.0,
+                 noise=1.5, spike_probability=0.005, spike_size=30.0, seed=None):
+        super().__init__(rate_hz if realtime else None)
+        self.sample_rate = rate_hz
+        self.limit = None if seconds is None else int(seconds * rate_hz)
+        self.baseline = baseline
+        self.drift = drift
+        self.noise = noise
+        self.spike_probability = spike_probability
+        self.spike_size = spike_size
+        self.rng = np.random.default_rng(seed)
+
+    def _next(self, count):
+        if self.limit is not None:
+            count = min(count, self.limit - self.delivered)
+        t = (self.delivered + np.arange(max(count, 0))) / self.sample_rate
+        readings = self.baseline + self.drift * np.sin(2 * np.pi * t / 60) + self.rng.normal(0, self.noise, len(t))
+        spikes = self.rng.random(len(t)) < self.spike_probability
+        readings[spikes] += self.rng.choice((-1, 1), spikes.sum()) * self.spike_size
+        return readings
+
+
+class ReplaySource(SampleSource):
+    """Readings replayed from a .npy array or a text file with one reading per line.
+
+    A .npy file is memory-mapped and text is read a block at a time, so
+    replaying a long recording does not load it whole. A non-numeric first
+    line is skipped as a header, and only the first comma-separated field is read.
+    Later lines that are not finite numbers, such as comments, are skipped
+    and counted in dropped; blank lines are ignored. NaN and infinite values
+    in a .npy array are skipped and counted the same way.
+    """
+
+    def __init__(self, path, rate_hz=None):
+        super().__init__(rate_hz)
+        self.path = path
+        if path.endswith(".npy"):
+            self._array = np.load(path, mmap_mode="r").reshape(-1)
+            self._offset = 0  # array position; ahead of delivered by the readings dropped
+            self._lines = None
+        else:
+            self._array = None
+            self._file = open(path)
+            self._lines = self._readings(line.split(",")[0].strip() for line in self._file)
+
+    def _readings(self, fields):
+        """Finite readings from the first fields of non-blank lines; other lines count as dropped"""
+        for number, field in enumerate(field for field in fields if field):
+            try:
+                reading = float(field)
+            except ValueError:
+                # A header is expected on the first line; anything else is a bad sample
+                self.dropped += number > 0
+                continue
+            if np.isfinite(reading):
+                yield reading
+            else:
+                self.dropped += 1
+
+    def _next(self, count):
+        if self._array is not None:
+            # Read on past blocks that were all non-finite, so they don't end the replay
+            while count > 0 and self._offset < len(self._array):
+                block = np.asarray(self._array[self._offset:self._offset + count], dtype=np.float64)
+                self._offset += len(block)
+                finite = np.isfinite(block)
+                if not finite.all():
+                    self.dropped += int(len(block) - np.count_nonzero(finite))
+                    block = block[finite]
+                if len(block):
+                    return block
+            return np.empty(0)
+        block = np.fromiter(itertools.islice(self._lines, count), dtype=np.float64)
+        if not len(block):
+            self._file.close()
+        return block
+
+
+def clean_window(readings, outlier_z=3.5, smoothing=5):
+    """Drop outliers by robust z-score and smooth with a moving average; return (samples, rejected)"""
+    total = len(readings)
+    # Non-finite readings count as rejected; one NaN would make the median and MAD NaN
+    readings = readings[np.isfinite(readings)]
+    if not len(readings):
+        return readings, total
+    median = np.median(readings)
+    mad = np.median(np.abs(readings - median))
+    if mad:
+        keep = np.abs(0.6745 * (readings - median) / mad) <= outlier_z
+    else:
+        keep = readings == median
+    kept = readings[keep]
+    if smoothing > 1 and len(kept) >= smoothing:
+        kept = np.convolve(kept, np.full(smoothing, 1.0 / smoothing), mode="valid")
+    return kept, int(total - keep.sum())
+
+
+class IRStreamPipeline:
+    """Ring-buffered ingestion of a SampleSource with batched prediction per window.
+
+    A window of the newest window samples is scored every hop samples once
+    the buffer holds a full window. Only the buffer, the last result and a
+    bounded latency history are kept.
+    """
+
+    def __init__(self, predictor, source, window=256, hop=None, outlier_z=3.5, smoothing=5,
+                 block_size=64, buffer_capacity=None):
+        if buffer_capacity is not None and buffer_capacity < window:
+            raise ValueError("buffer_capacity must hold at least one window")
+        self.predictor = predictor
+        self.source = source
+        self.window = window
+        self.hop = hop or max(window // 2, 1)
+        self.outlier_z = outlier_z
+        self.smoothing = smoothing
+        self.block_size = block_size
+        self.buffer = RingBuffer(buffer_capacity or 4 * window)
+        self.latest = None
+        self.windows = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _score(self, arrived):
+        readings = self.buffer.latest(self.window)
+        cleaned, rejected = clean_window(readings, self.outlier_z, self.smoothing)
+        if len(cleaned):
+            glucose = float(np.median(self.predictor.predict_glucose_batch(cleaned)))
+            reading = float(cleaned.mean())
+        else:
+            glucose = reading = float("nan")
+        latency_ms = (time.perf_counter() - arrived) * 1000
+        result = WindowResult(self.windows, self.buffer.total, glucose, reading, rejected, latency_ms)
+        self.windows += 1
+        self.rejected += rejected
+        self.latencies.append(latency_ms)
+        self.latest = result
+        return result
+
+    def run(self, max_windows=None):
+        """Consume the source, yielding a WindowResult for every scored window"""
+        while not self._stop.is_set() and (max_windows is None or self.windows < max_windows):
+            block = self.source.read(self.block_size)
+            if block is None:
+                return
+            arrived = time.perf_counter()
+            # Feed the block up to each window boundary so no window is skipped
+            while len(block):
+                total = self.buffer.total
+                if total < self.window:
+                    until_next = self.window - total
+                else:
+                    until_next = self.hop - (total - self.window) % self.hop
+                piece, block = block[:until_next], block[until_next:]
+                self.buffer.extend(piece)
+                if len(piece) == until_next:
+                    yield self._score(arrived)
+                    if max_windows is not None and self.windows >= max_windows:
+                        return
+
+    def start(self):
+        """Run the pipeline on a daemon thread, keeping only the latest result"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=lambda: deque(self.run(), maxlen=0), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        """Window, sample and rejection counts with latency percentiles over recent windows"""
+        latencies = np.array(self.latencies)
+        stats = {
+            "windows": self.windows,
+            "samples": self.buffer.total,
+            "rejected": self.rejected,
+            "dropped": self.source.dropped,
+            "buffer_bytes": self.buffer.data.nbytes,
+        }
+        if len(latencies):
+            stats.update({
+                "latency_ms_mean": float(latencies.mean()),
+                "latency_ms_p50": float(np.percentile(latencies, 50)),
+                "latency_ms_p95": float(np.percentile(latencies, 95)),
+                "latency_ms_max": float(latencies.max()),
+            })
+        return stats
+
+
+def main():
+    from AI_predictor1 import DEFAULT_MODEL_PATH, GlucosePredictor
+
+    parser = argparse.ArgumentParser(description="Stream IR sensor samples through the glucose predictor")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("--simulate", action="store_true", help="generate synthetic readings")
+    source_group.add_argument("--replay", metavar="PATH", help="replay readings from a .npy or text file")
+    parser.add_argument("--rate", type=float, help="samples per second (default 200 when simulating, unpaced replay)")
+    parser.add_argument("--seconds", type=float, default=10, help="length of a simulated stream")
+    parser.add_argument("--window", type=int, default=256)
+    parser.add_argument("--hop", type=int)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="saved glucose model artifact")
+    parser.add_argument("--quiet", action="store_true", help="print only the summary")
+    args = parser.parse_args()
+
+    predictor = GlucosePredictor()
+    predictor.load_or_train(args.model, plot=False)
+
+    if args.simulate:
+        source = SimulatedSource(rate_hz=args.rate or 200, seconds=args.seconds)
+    else:
+        source = ReplaySource(args.replay, rate_hz=args.rate)
+
+    pipeline = IRStreamPipeline(predictor, source, window=args.window, hop=args.hop)
+    for result in pipeline.run():
+        if not args.quiet:
+            print(f"window {result.index:>5}  sample {result.end_sample:>8}  glucose {result.glucose:6.1f} mg/dL"
+                  f"  reading {result.reading:6.1f}  rejected {result.rejected:>3}  {result.latency_ms:6.2f} ms")
+    for name, value in pipeline.stats().items():
+        print(f"{name}: {value:.2f}" if isinstance(value, float) else f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""Durable meal log in SQLite (WAL mode).
+
+Every logged meal is one row: user, day, time, meal type, nutrient totals
+and the foods as JSON. A meal logged under a meal id replaces the row
+logged under that id before, and retract_meal() deletes it, so the history
+can follow a live record where logging lunch again corrects it. log_meal()
+and retract_meal() only queue the change; one writer thread
+commits queued rows in groups, taking everything that arrived while the
+previous commit ran (up to batch_size rows) into the next transaction, so
+callers never wait on the disk and the cost of a commit is shared by the
+whole group. flush() waits until everything queued before it is committed. If a group
+fails to commit, it is retried row by row, so only the rows SQLite rejects
+are dropped, and the next flush() raises the error for them.
+Rows are indexed by (user, day), so a user's day, week or month is one
+index range scan, and WAL mode lets queries run while the writer commits.
+    python meal_history.py totals meals.db alice --days 7
+    python meal_history.py totals meals.db alice --days 28 --weekly
+"""
+import argparse
+import datetime
+import itertools
+import json
+import numbers
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+SCHEMA_VERSION = 2
+
+# Nutrient totals stored per meal; advisors that don't report one store NULL
+NUTRIENTS = ("calories", "carbs", "protein", "fat", "glycemic_load")
+
+# Rows per commit at most. (user, day) index inserts land all over the index, so large commits
+# spread the cost of each dirtied index page over many rows
+DEFAULT_BATCH_SIZE = 32768
+
+# Page cache of the writer connection, in KiB; holds the index pages commits keep touching
+WRITER_CACHE_KIB = 64 * 1024
+
+# One meal as stored; foods maps food name to servings
+Meal = namedtuple("Meal", ("user", "day", "logged_at", "meal_type") + NUTRIENTS + ("foods",))
+
+# Nutrient totals over a period: a day, or the Monday starting a week
+Totals = namedtuple("Totals", ("period", "meals") + NUTRIENTS)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meals (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    day TEXT NOT NULL,
+    logged_at REAL NOT NULL,
+    meal_type TEXT,
+    {", ".join(f"{nutrient} REAL" for nutrient in NUTRIENTS)},
+    foods TEXT NOT NULL,
+    meal_id TEXT
+);
+CREATE INDEX IF NOT EXISTS meals_by_user_day ON meals (user, day);
+CREATE UNIQUE INDEX IF NOT EXISTS meals_by_meal_id ON meals (meal_id);
+"""
+
+# A row with the meal id of a stored one replaces it; rows without a meal id (NULL) never conflict
+INSERT = f"INSERT OR REPLACE INTO meals (user, day, logged_at, meal_type, {', '.join(NUTRIENTS)}, foods, meal_id) " \
+         f"VALUES ({', '.join('?' * (len(NUTRIENTS) + 6))})"
+
+DELETE = "DELETE FROM meals WHERE meal_id = ?"
+
+# Queued by retract_meal in place of a row
+_Retraction = namedtuple("_Retraction", ("meal_id",))
+
+SUMS = ", ".join(f"TOTAL({nutrient})" for nutrient in NUTRIENTS)
+
+# ISO day of the Monday starting a day's week
+WEEK_START = "date(day, '-6 days', 'weekday 1')"
+
+
+def _check_row(row):
+    """Raise ValueError for a row that can't be stored, before it can join a group commit"""
+    if len(row) != len(NUTRIENTS) + 5:
+        raise ValueError(f"Meal row has {len(row)} fields, expected {len(NUTRIENTS) + 5}: {row!r}")
+    user, day, logged_at, meal_type, *nutrients, foods = row
+    number = (int, float)
+    if not (isinstance(user, str) and isinstance(day, str) and isinstance(logged_at, number)
+            and isinstance(meal_type, (str, type(None))) and isinstance(foods, str)
+            and all(isinstance(value, (*number, type(None))) for value in nutrients)):
+        raise ValueError(f"Meal row fields must be (str, str, number, str or None, "
+                         f"{len(NUTRIENTS)} numbers or None, str): {row!r}")
+
+
+# Field types log_meal stores without converting or checking them
+_PLAIN = frozenset((float, int, type(None)))
+
+
+def _float(value):
+    """A number as a float, so SQLite stores it as REAL; anything else as it is, for _check_row"""
+    return float(value) if isinstance(value, numbers.Real) else value
+
+
+def _meal_key(meal_id):
+    """Stored form of a meal id, any JSON value; tuples and lists give the same key"""
+    return json.dumps(meal_id)
+
+
+def _day(day):
+    """ISO date string for a date, datetime or ISO string"""
+    return day if isinstance(day, str) else day.isoformat()[:10]
+
+
+class MealHistory:
+    """Meal log with a group-committing writer thread"""
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, synchronous="NORMAL"):
+        # synchronous=NORMAL in WAL mode survives application crashes; FULL also survives power loss
+        self.path = path
+        self.batch_size = batch_size
+        self.synchronous = synchronous
+        self.rows_written = 0
+        self.commits = 0
+        self.largest_commit = 0
+        self.rows_dropped = 0
+        self.rows_retracted = 0
+        self._queue = queue.SimpleQueue()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._error = None
+        self._closed = False
+
+        connection = self._connect()
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, 1, SCHEMA_VERSION):
+            connection.close()
+            raise ValueError(f"{path} has meal history schema version {version}, expected {SCHEMA_VERSION}")
+        connection.execute("PRAGMA journal_mode=WAL")
+        if version == 1:
+            # Version 1 had no meal ids; its rows keep NULL
+            connection.execute("ALTER TABLE meals ADD COLUMN meal_id TEXT")
+        connection.executescript(SCHEMA)
+        connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        connection.close()
+
+        self._writer = threading.Thread(target=self._write_batches, name="meal-history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        return connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def log_meal(self, user_id, meal_type, nutrition, foods, logged_at=None, meal_id=None):
+        """Queue one meal: nutrient totals by name, foods as {name: servings}; logged_at defaults to now.
+
+        A meal_id replaces the meal logged under it before, if any.
+        """
+        self._check_open()
+        logged_at = time.time() if logged_at is None else logged_at
+        if isinstance(logged_at, datetime.datetime):
+            logged_at = logged_at.timestamp()
+        day = datetime.date.fromtimestamp(logged_at).isoformat()
+        nutrients = tuple(map(nutrition.get, NUTRIENTS))
+        row = (str(user_id), day, logged_at, meal_type, *nutrients, json.dumps(foods))
+        if not (type(logged_at) is float and type(meal_type) is str and _PLAIN.issuperset(map(type, nutrients))):
+            # NumPy scalars would be stored as BLOBs that SUM skips, so numbers are stored as floats
+            row = tuple(map(_float, row))
+            _check_row(row)
+        self._queue.put(row + (None if meal_id is None else _meal_key(meal_id),))
+
+    def retract_meal(self, meal_id):
+        """Queue deleting the meal logged under meal_id; a meal id never logged is ignored"""
+        self._check_open()
+        self._queue.put(_Retraction(_meal_key(meal_id)))
+
+    def log_rows(self, rows):
+        """Queue already encoded rows, (user, day, logged_at, meal_type, *NUTRIENTS, foods JSON), for bulk loads"""
+        self._check_open()
+        rows = [tuple(row) for row in rows]
+        for row in rows:
+            _check_row(row)
+        self._queue.put([row + (None,) for row in rows])
+
+    def _check_open(self):
+        if self._closed:
+            raise ValueError(f"Meal history {self.path} is closed")
+
+    def flush(self, timeout=None):
+        """Wait until every meal queued so far is committed and visible to queries"""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        if not done.wait(timeout):
+            raise TimeoutError(f"Meal history writes not committed within {timeout} s")
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self):
+        """Commit queued meals, stop the writer and close every connection"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        with self._readers_lock:
+            for connection in self._readers:
+                connection.close()
+            self._readers.clear()
+
+    def _write_batches(self):
+        connection = self._connect()
+        connection.execute(f"PRAGMA cache_size=-{WRITER_CACHE_KIB}")
+        try:
+            stopping = False
+            while not stopping:
+                rows, waiters = [], []
+                item = self._queue.get()
+                # Group everything already queued into this commit
+                while True:
+                    if item is None:
+                        stopping = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    elif isinstance(item, list):
+                        rows.extend(item)
+                    else:
+                        rows.append(item)
+                    if stopping or len(rows) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if rows:
+                    self._commit(connection, rows)
+                for waiter in waiters:
+                    waiter.set()
+        finally:
+            connection.close()
+
+    def _commit(self, connection, rows):
+        try:
+            connection.execute("BEGIN")
+            # Rows and retractions in queue order, each run of either in one executemany
+            for retraction, run in itertools.groupby(rows, key=lambda row: isinstance(row, _Retraction)):
+                connection.executemany(DELETE if retraction else INSERT, run)
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            # Keep the rest of the group: retry it row by row and drop only the rows that fail
+            self._commit_rows(connection, rows)
+            return
+        self._committed(rows)
+
+    def _commit_rows(self, connection, rows):
+        written, failed, error = [], 0, None
+        try:
+            connection.execute("BEGIN")
+            for row in rows:
+                try:
+                    connection.execute(DELETE if isinstance(row, _Retraction) else INSERT, row)
+                    written.append(row)
+                except sqlite3.Error as e:
+                    # A failed INSERT only undoes itself; the transaction goes on
+                    failed += 1
+                    error = error or e
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            written, failed, error = [], len(rows), e
+        self.rows_dropped += failed
+        if written:
+            self._committed(written)
+        if error is not None:
+            # Raised by the next flush() or close()
+            self._error = type(error)(f"{failed} of {len(rows)} meal rows not stored: {error}")
+
+    def _committed(self, rows):
+        retracted = sum(isinstance(row, _Retraction) for row in rows)
+        self.rows_retracted += retracted
+        self.rows_written += len(rows) - retracted
+        self.commits += 1
+        self.largest_commit = max(self.largest_commit, len(rows))
+
+    def _reader(self):
+        # One connection per querying thread; WAL readers never block the writer
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            with self._readers_lock:
+                self._readers.append(connection)
+        return connection
+
+    def meals(self, user_id, start, end=None):
+        """Committed meals of a user from day start through day end (default start), oldest first"""
+        rows = self._reader().execute(
+            f"SELECT user, day, logged_at, meal_type, {', '.join(NUTRIENTS)}, foods FROM meals "
+            "WHERE user = ? AND day BETWEEN ? AND ? ORDER BY logged_at",
+            (str(user_id), _day(start), _day(end if end is not None else start)),
+        )
+        return [Meal(*row[:-1], json.loads(row[-1])) for row in rows]
+
+    def daily_totals(self, user_id, start, end):
+        """Totals for each day with meals from start through end"""
+        rows = self._reader().execute(
+            f"SELECT day, COUNT(*), {SUMS} FROM meals WHERE user = ? AND day BETWEEN ? AND ? "
+            "GROUP BY day ORDER BY day",
+            (str(user_id), _day(start), _day(end)),
+        )
+        return [Totals(*row) for row in rows]
+
+    def weekly_totals(self, user_id, start, end):
+        """Totals for each Monday-to-Sunday week with meals from start through end, keyed by the Monday"""
+        rows = self._reader().execute(
+            f"SELECT {WEEK_START} AS week, COUNT(*), {SUMS} FROM meals "
+            "WHERE user = ? AND day BETWEEN ? AND ? GROUP BY week ORDER BY week",
+            (str(user_id), _day(start), _day(end)),
+        )
+        return [Totals(*row) for row in rows]
+
+    def totals(self, user_id, start, end):
+        """Totals over every meal of a user from start through end"""
+        row = self._reader().execute(
+            f"SELECT COUNT(*), {SUMS} FROM meals WHERE user = ? AND day BETWEEN ? AND ?",
+            (str(user_id), _day(start), _day(end)),
+        ).fetchone()
+        return Totals(f"{_day(start)}/{_day(end)}", *row)
+
+    def __len__(self):
+        return self._reader().execute("SELECT COUNT(*) FROM meals").fetchone()[0]
+
+    def stats(self):
+        """Writer counters"""
+        return {
+            "rows_written": self.rows_written,
+            "commits": self.commits,
+            "mean_commit": self.rows_written / self.commits if self.commits else 0.0,
+            "largest_commit": self.largest_commit,
+            "rows_dropped": self.rows_dropped,
+            "rows_retracted": self.rows_retracted,
+            "batch_size": self.batch_size,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a meal history database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    totals = commands.add_parser("totals", help="a user's daily or weekly nutrient totals")
+    totals.add_argument("path")
+    totals.add_argument("user")
+    totals.add_argument("--days", type=int, default=7, help="days back from --end, inclusive of it")
+    totals.add_argument("--end", default=datetime.date.today().isoformat(), help="last day, YYYY-MM-DD")
+    totals.add_argument("--weekly", action="store_true", help="group by Monday-to-Sunday week")
+    args = parser.parse_args()
+
+    end = datetime.date.fromisoformat(args.end)
+    start = end - datetime.timedelta(days=args.days - 1)
+    with MealHistory(args.path) as history:
+        query = history.weekly_totals if args.weekly else history.daily_totals
+        print(f"{'week of' if args.weekly else 'day':<10} {'meals':>5} " +
+              " ".join(f"{nutrient:>13}" for nutrient in NUTRIENTS))
+        for row in query(args.user, start, end):
+            print(f"{row.period:<10} {row.meals:>5} " + " ".join(f"{value:>13.1f}" for value in row[2:]))
+
+
+if __name__ == "__main__":
+    main()
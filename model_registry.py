@@ -0,0 +1,207 @@
+"""Glucose models keyed by (user, finger type), loaded on demand.
+
+Artifacts written by GlucosePredictor.save_model live under a root
+directory:
+    <root>/default/all.joblib           both fingers, the last fallback
+    <root>/default/<finger>.joblib      shared model for one finger
+    <root>/users/<user>/<finger>.joblib one user's model for one finger
+A lookup takes the most specific artifact that exists. Loaded models are
+kept in an LRU bounded by a memory budget, measured as artifact file
+size, and concurrent requests for the same cold artifact share one load.
+Default artifacts are checked against the built-in training data they are
+built from, and count in stale_loads when it has changed since; per-user
+artifacts are trained on the user's own data, so they are not checked.
+Any artifact saved with another scikit-learn version also counts as stale.
+Train the shared default models:
+    python model_registry.py build models/ --n-jobs 4
+"""
+import argparse
+import contextlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from AI_predictor1 import FINGER_TYPES, GlucosePredictor
+
+DEFAULT_USER = "default"
+ALL_FINGERS = "all"
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+class ModelRegistry:
+    """Thread-safe on-demand cache of GlucosePredictors under a memory budget"""
+
+    def __init__(self, root, memory_budget=DEFAULT_MEMORY_BUDGET, mmap=False):
+        self.root = root
+        self.memory_budget = memory_budget
+        self.mmap = mmap
+        self._models = OrderedDict()  # artifact path -> (predictor, bytes)
+        self._loading = {}  # artifact path -> Future of a load in progress
+        self._lock = threading.Lock()
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.stale_loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self.max_load_seconds = 0.0
+        self._training_hashes = {}  # finger type -> hash of the built-in data default artifacts train on
+
+    def artifact_path(self, user_id, finger_type):
+        """Where the artifact for one user (or DEFAULT_USER) and finger type is stored"""
+        if finger_type != ALL_FINGERS and finger_type not in FINGER_TYPES:
+            raise ValueError(f"Unknown finger type: {finger_type}")
+        if user_id == DEFAULT_USER:
+            return os.path.join(self.root, DEFAULT_USER, f"{finger_type}.joblib")
+        user = str(user_id)
+        if not user or user in (".", "..") or os.sep in user or (os.altsep and os.altsep in user):
+            raise ValueError(f"User id {user_id!r} cannot name a model directory")
+        return os.path.join(self.root, "users", user, f"{finger_type}.joblib")
+
+    def resolve(self, user_id, finger_type):
+        """Most specific existing artifact for a user and finger type"""
+        candidates = [(DEFAULT_USER, finger_type), (DEFAULT_USER, ALL_FINGERS)]
+        if user_id is not None and user_id != DEFAULT_USER:
+            candidates.insert(0, (user_id, finger_type))
+        for candidate in candidates:
+            path = self.artifact_path(*candidate)
+            if os.path.exists(path):
+                return path
+        raise LookupError(f"No glucose model for user {user_id!r}, finger {finger_type!r} under {self.root}")
+
+    def get(self, user_id=None, finger_type="little"):
+        """GlucosePredictor for a user and finger type, loading it on first use"""
+        path = self.resolve(user_id, finger_type)
+        with self._lock:
+            entry = self._models.get(path)
+            if entry is not None:
+                self._models.move_to_end(path)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            future = self._loading.get(path)
+            owner = future is None
+            if owner:
+                future = self._loading[path] = Future()
+
+        if not owner:
+            # Another thread is loading this artifact; wait for its result
+            return future.result()
+
+        try:
+            predictor = self._load(path)
+        except BaseException as error:
+            with self._lock:
+                self.load_errors += 1
+                del self._loading[path]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            del self._loading[path]
+            self._store(path, predictor)
+        future.set_result(predictor)
+        return predictor
+
+    def _training_hash(self, finger_type):
+        with self._lock:
+            digest = self._training_hashes.get(finger_type)
+        if digest is None:
+            digest = GlucosePredictor(finger_type).training_data_hash()
+            with self._lock:
+                self._training_hashes[finger_type] = digest
+        return digest
+
+    def _load(self, path):
+        import sklearn
+
+        start = time.perf_counter()
+        predictor = GlucosePredictor()
+        predictor.load_model(path, mmap=self.mmap, check_data=False)
+        # Pickled by another scikit-learn version, so its estimators may not behave the same
+        stale = predictor.sklearn_version != sklearn.__version__
+        if not stale and os.path.dirname(path) == os.path.join(self.root, DEFAULT_USER):
+            # Built by build_defaults from the built-in data, hashed once per finger type
+            stale = predictor.data_hash != self._training_hash(predictor.finger_type)
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.loads += 1
+            self.stale_loads += stale
+            self.load_seconds += seconds
+            self.max_load_seconds = max(self.max_load_seconds, seconds)
+        return predictor
+
+    def _store(self, path, predictor):
+        size = os.path.getsize(path)
+        self._models[path] = (predictor, size)
+        self.memory_used += size
+        # Evict least recently used models, always keeping the one just loaded
+        while self.memory_used > self.memory_budget and len(self._models) > 1:
+            _, (_, evicted_size) = self._models.popitem(last=False)
+            self.memory_used -= evicted_size
+            self.evictions += 1
+
+    def predict(self, user_id, finger_type, sensor_readings):
+        """Batched predictions from the model routed for a user and finger type"""
+        return self.get(user_id, finger_type).predict_glucose_batch(sensor_readings, finger_type)
+
+    def clear(self):
+        """Drop every cached model; counters are kept"""
+        with self._lock:
+            self._models.clear()
+            self.memory_used = 0
+
+    def __len__(self):
+        return len(self._models)
+
+    def stats(self):
+        """Cache size and hit/miss/eviction counters with load latency"""
+        lookups = self.hits + self.misses
+        return {
+            "models": len(self._models),
+            "memory_used": self.memory_used,
+            "memory_budget": self.memory_budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "stale_loads": self.stale_loads,
+            "evictions": self.evictions,
+            "load_ms_mean": self.load_seconds / self.loads * 1000 if self.loads else 0.0,
+            "load_ms_max": self.max_load_seconds * 1000,
+        }
+
+
+def build_defaults(root, n_jobs=None, quiet=True):
+    """Train and save the shared models for both fingers together and each finger alone"""
+    paths = []
+    for finger_type in (ALL_FINGERS,) + FINGER_TYPES:
+        predictor = GlucosePredictor(None if finger_type == ALL_FINGERS else finger_type)
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            predictor.train_model(plot=False, n_jobs=n_jobs)
+        path = os.path.join(root, DEFAULT_USER, f"{finger_type}.joblib")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        predictor.save_model(path)
+        paths.append((path, predictor.model_name, predictor.metrics["r2"]))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage per-user, per-finger glucose models")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="train the shared default models into a registry root")
+    build.add_argument("root")
+    build.add_argument("--n-jobs", type=int, default=None, help="processes for cross-validation fits; -1 for one per CPU")
+    args = parser.parse_args()
+
+    for path, model_name, r2 in build_defaults(args.root, n_jobs=args.n_jobs):
+        print(f"{path}: {model_name} (cross-validated R² {r2:.3f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import numpy as np
+
+_sparse = None
+
+
+def scipy_sparse():
+    """scipy.sparse, imported on first batch use since it is slow to load; None if not installed"""
+    global _sparse
+    if _sparse is None:
+        try:
+            from scipy import sparse
+        except ImportError:  # batch products fall back to a dense scatter-add
+            sparse = False
+        _sparse = sparse
+    return _sparse or None
+
+# Nutrient columns, in matrix order
+NUTRIENTS = ("calories", "carbs", "protein", "fat")
+
+
+class NutrientMatrix:
+    """Food database held as a foods x nutrients matrix with a name -> row lookup"""
+
+    def __init__(self, food_database, nutrients=NUTRIENTS):
+        self.nutrients = tuple(nutrients)
+        self.n_foods = len(food_database)
+
+        if hasattr(food_database, "column_matrix"):
+            # A FoodStore already holds these columns on disk; use them in place
+            self.matrix = food_database.column_matrix(self.nutrients)
+            self.row_of = food_database.row_of
+        else:
+            foods = list(food_database)
+            index = {food: row for row, food in enumerate(foods)}
+            self.row_of = index.get
+            self.matrix = np.array(
+                [[food_database[food][nutrient] for nutrient in self.nutrients] for food in foods],
+                dtype=np.float64,
+            ).reshape(len(foods), len(self.nutrients))
+        # Matrix rows as Python tuples, by row index, for per-food arithmetic without NumPy overhead
+        self._row_values = {}
+
+    def _rows(self, food_quantities):
+        """Row indices and quantities for the known foods of one meal"""
+        rows = []
+        quantities = []
+        for food, quantity in food_quantities.items():
+            row = self.row_of(food)
+            if row is not None:
+                rows.append(row)
+                quantities.append(quantity)
+        return rows, quantities
+
+    def totals(self, food_quantities):
+        """Nutrient totals for one meal as a single quantity-vector product"""
+        rows, quantities = self._rows(food_quantities)
+        if not rows:
+            return np.zeros(len(self.nutrients))
+        return np.asarray(quantities, dtype=np.float64) @ self.matrix[rows]
+
+    def food_values(self, food):
+        """A food's nutrients as a tuple in nutrient order, None for an unknown food"""
+        row = self.row_of(food)
+        if row is None:
+            return None
+        values = self._row_values.get(row)
+        if values is None:
+            # Converted on first use, so a large FoodStore isn't read in full
+            values = self._row_values[row] = tuple(self.matrix[row].tolist())
+        return values
+
+    def quantity_matrix(self, meals):
+        """Build a sparse meals x foods quantity matrix from a sequence of food_quantities dicts.
+
+        Returns a scipy CSR matrix, or (meal_rows, food_rows, quantities)
+        arrays in coordinate form when scipy is not installed.
+        """
+        meals = list(meals)
+        meal_rows = []
+        food_rows = []
+        quantities = []
+        for meal_row, food_quantities in enumerate(meals):
+            rows, meal_quantities = self._rows(food_quantities)
+            meal_rows.extend([meal_row] * len(rows))
+            food_rows.extend(rows)
+            quantities.extend(meal_quantities)
+
+        meal_rows = np.asarray(meal_rows, dtype=np.int64)
+        food_rows = np.asarray(food_rows, dtype=np.int64)
+        quantities = np.asarray(quantities, dtype=np.float64)
+        sparse = scipy_sparse()
+        if sparse is None:
+            return meal_rows, food_rows, quantities
+        return sparse.csr_matrix(
+            (quantities, (meal_rows, food_rows)), shape=(len(meals), self.n_foods)
+        )
+
+    def batch_totals(self, meals):
+        """Nutrient totals for many meals at once, as an (n_meals, n_nutrients) array"""
+        meals = list(meals)
+        quantities = self.quantity_matrix(meals)
+        if scipy_sparse() is not None:
+            return np.asarray(quantities @ self.matrix)
+
+        meal_rows, food_rows, values = quantities
+        result = np.zeros((len(meals), len(self.nutrients)))
+        np.add.at(result, meal_rows, values[:, None] * self.matrix[food_rows])
+        return result
@@ -0,0 +1,142 @@
+"""Incremental per-user nutrient totals by meal, day, week and month.
+
+Every meal is recorded under an id chosen by the caller; HealthFoodAdvisor
+uses (user, day, meal type), so logging lunch again replaces the earlier
+lunch. Recording a meal adds its nutrients to four running totals: its
+meal slot (user, day, meal type), its day, its Monday-to-Sunday week and
+its month. Re-recording an id adds only the difference and retracting it
+subtracts what it added, so inserts, corrections and retractions each
+touch four rows whatever the history length, and dashboards read totals
+without scanning meals. Each (level, user, period) key has one row of
+totals, a plain list, since a few float additions on it are far cheaper
+than any NumPy call.
+"""
+import datetime
+import json
+import threading
+
+from meal_history import NUTRIENTS, Totals
+
+LEVELS = ("meal", "day", "week", "month")
+
+# Columns of every totals row: meal count, then each nutrient
+COLUMNS = ("meals",) + NUTRIENTS
+
+
+def period_keys(user_id, day, meal_type=None):
+    """(level, user, period) key for each of LEVELS that a meal of meal_type on day falls in"""
+    if isinstance(day, str):
+        iso, day = day[:10], datetime.date.fromisoformat(day[:10])
+    else:
+        iso = day.isoformat()[:10]
+    monday = day.toordinal() - day.weekday()
+    return (("meal", user_id, f"{iso}/{meal_type}"),
+            ("day", user_id, iso),
+            ("week", user_id, datetime.date.fromordinal(monday).isoformat()),
+            ("month", user_id, iso[:7]))
+
+
+class NutritionRollups:
+    """Thread-safe running totals, updated in O(1) per meal insert, correction or retraction"""
+
+    def __init__(self):
+        self.rows = {}  # (level, user, period) -> list of COLUMNS totals
+        self.meals = {}  # meal id -> (rows it was added to, values it added)
+        self._lock = threading.Lock()
+        self.inserts = 0
+        self.corrections = 0
+        self.retractions = 0
+
+    def __len__(self):
+        return len(self.meals)
+
+    def __contains__(self, meal_id):
+        return meal_id in self.meals
+
+    def _rows(self, keys):
+        rows = self.rows
+        return tuple(rows.get(key) or rows.setdefault(key, [0.0] * len(COLUMNS)) for key in keys)
+
+    @staticmethod
+    def _add(rows, values, sign):
+        for row in rows:
+            # Rows are updated in place, since meals hold references to them
+            row[:] = [total + sign * value for total, value in zip(row, values)]
+            if row[0] <= 0:
+                # A period with no meals left is exactly zero again, not float residue
+                row[:] = [0.0] * len(COLUMNS)
+
+    def record(self, meal_id, user_id, day, meal_type, nutrition):
+        """Add a meal, or replace the one recorded under meal_id, adding only the difference"""
+        values = (1.0,) + tuple(float(nutrition.get(nutrient) or 0.0) for nutrient in NUTRIENTS)
+        keys = period_keys(user_id, day, meal_type)
+        with self._lock:
+            rows = self._rows(keys)
+            previous = self.meals.get(meal_id)
+            if previous is None:
+                self.inserts += 1
+            else:
+                # Take out what the meal added before, possibly to another day or meal slot
+                self._add(*previous, -1)
+                self.corrections += 1
+            self._add(rows, values, 1)
+            self.meals[meal_id] = (rows, values)
+
+    def retract(self, meal_id):
+        """Remove a recorded meal from every total; return whether it was recorded"""
+        with self._lock:
+            previous = self.meals.pop(meal_id, None)
+            if previous is None:
+                return False
+            self._add(*previous, -1)
+            self.retractions += 1
+            return True
+
+    def totals(self, user_id, level, day, meal_type=None):
+        """Totals of the level's period containing day; meal_type picks the slot at the meal level"""
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level {level!r}, expected one of {LEVELS}")
+        key = period_keys(user_id, day, meal_type)[LEVELS.index(level)]
+        values = self.rows.get(key) or [0.0] * len(COLUMNS)
+        return Totals(key[2], int(values[0]), *values[1:])
+
+    def series(self, user_id, level, days):
+        """Totals for the periods containing each of days, in order"""
+        return [self.totals(user_id, level, day) for day in days]
+
+    def stats(self):
+        return {
+            "meals": len(self.meals),
+            "periods": len(self.rows),
+            "inserts": self.inserts,
+            "corrections": self.corrections,
+            "retractions": self.retractions,
+        }
+
+    def save(self, path):
+        """Write totals and recorded meals as JSON; user and meal ids must be JSON-serializable"""
+        with self._lock:
+            index = {id(row): i for i, row in enumerate(self.rows.values())}
+            state = {
+                "keys": list(self.rows),
+                "totals": list(self.rows.values()),
+                "meals": [[meal_id, [index[id(row)] for row in rows], values]
+                          for meal_id, (rows, values) in self.meals.items()],
+            }
+            with open(path, "w") as f:
+                json.dump(state, f)
+
+    @classmethod
+    def load(cls, path):
+        def key(value):
+            # JSON turns tuples into lists
+            return tuple(key(item) for item in value) if isinstance(value, list) else value
+
+        with open(path) as f:
+            state = json.load(f)
+        rollups = cls()
+        rows = state["totals"]
+        rollups.rows = {key(k): row for k, row in zip(state["keys"], rows)}
+        rollups.meals = {key(meal_id): (tuple(rows[i] for i in indexes), tuple(values))
+                         for meal_id, indexes, values in state["meals"]}
+        return rollups
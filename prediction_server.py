@@ -0,0 +1,298 @@
+"""Local HTTP prediction service for GlucosePredictor with dynamic micro-batching.
+
+Endpoints (HTTP/1.1 with keep-alive, over TCP or a Unix socket):
+    POST /predict  {"reading": 170.2, "finger_type": "little"}
+                   -> {"glucose": 181.4, "model_version": "..."}
+    GET  /health   readiness and the loaded model version; 503 until loaded
+    GET  /stats    request, batch and rejection counters
+Single-reading requests wait in a bounded queue. One batcher drains it into
+a predict_glucose_batch call as soon as max_batch requests are waiting or
+the first has waited max_wait_ms; while a batch runs, the next one fills.
+A full queue answers 503 at once rather than queueing without bound. If the
+model fails on a batch, its requests are retried one by one, so only the one
+it fails on gets a 500.
+
+Run from the repository root:
+    python prediction_server.py --port 8780 --model glucose_model.joblib
+    python prediction_server.py --unix /tmp/glucose.sock --max-batch 1
+"""
+import argparse
+import asyncio
+import json
+import math
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from AI_predictor1 import DEFAULT_MODEL_PATH, FINGER_TYPES, GlucosePredictor
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+MAX_BODY = 64 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class PredictionServer:
+    """Serve GlucosePredictor predictions, coalescing concurrent requests into batches"""
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, max_batch=256, max_wait_ms=2.0, queue_size=4096,
+                 predictor=None):
+        self.model_path = model_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue_size = queue_size
+        self.predictor = predictor
+        self.ready = False
+        self.model_version = None
+        self.requests_served = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.rejected = 0
+        self._server = None
+        self._queue = None
+        self._batcher = None
+        self._executor = None
+        self._connections = {}
+        self._closing = False
+
+    async def start(self, host="127.0.0.1", port=8780, path=None):
+        """Load the model, then listen on a TCP port, or on a Unix socket when path is given"""
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="glucose-model")
+        self._queue = asyncio.Queue(self.queue_size)
+        if path:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+
+        # Health checks are answered (not ready) while the model loads
+        loop = asyncio.get_running_loop()
+        if self.predictor is None:
+            self.predictor = GlucosePredictor()
+            await loop.run_in_executor(self._executor, lambda: self.predictor.load_or_train(self.model_path, plot=False))
+        self.model_version = f"{self.predictor.model_name}@{(self.predictor.data_hash or '')[:12]}"
+        self._batcher = asyncio.create_task(self._run_batches())
+        self.ready = True
+        return self._server
+
+    @property
+    def sockets(self):
+        return self._server.sockets if self._server else ()
+
+    async def shutdown(self):
+        """Stop accepting connections, answer queued requests, then release the model thread"""
+        self._closing = True
+        self.ready = False
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            await self._queue.join()
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+        # Idle keep-alive connections are waiting on readline; closing them lets their handlers finish
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            readings = np.array([reading for reading, _, _ in batch])
+            fingers = [finger for _, finger, _ in batch]
+            try:
+                predictions = await loop.run_in_executor(
+                    self._executor, self.predictor.predict_glucose_batch, readings, fingers
+                )
+                for (_, _, future), prediction in zip(batch, predictions.tolist()):
+                    if not future.done():
+                        future.set_result(round(prediction, 1))
+            except Exception:
+                # Predict the batch's requests one by one, so a request the model rejects fails alone
+                for reading, finger, future in batch:
+                    try:
+                        prediction = await loop.run_in_executor(
+                            self._executor, self.predictor.predict_glucose_batch, np.array([reading]), [finger]
+                        )
+                        result = round(prediction.tolist()[0], 1)
+                    except Exception as e:
+                        if not future.done():
+                            future.set_exception(e)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+            finally:
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, len(batch))
+                self.requests_served += len(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def health(self):
+        return {
+            "status": "ok" if self.ready else "loading",
+            "ready": self.ready,
+            "model": self.predictor.model_name if self.ready else None,
+            "model_version": self.model_version,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+        }
+
+    def stats(self):
+        return {
+            "requests": self.requests_served,
+            "batches": self.batches,
+            "mean_batch": self.requests_served / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "rejected": self.rejected,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    async def _predict(self, body):
+        try:
+            request = json.loads(body)
+            reading = float(request["reading"])
+            finger_type = request.get("finger_type", "little")
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(400, "Expected a JSON object with a numeric 'reading'")
+        if not math.isfinite(reading):
+            # json accepts NaN and Infinity, which the model can't predict from
+            raise HTTPError(400, "'reading' must be a finite number")
+        if finger_type not in FINGER_TYPES:
+            raise HTTPError(400, f"Unknown finger type: {finger_type}")
+        if not self.ready:
+            raise HTTPError(503, "Model is not loaded yet")
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((reading, finger_type, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPError(503, "Prediction queue is full")
+        try:
+            glucose = await future
+        except Exception as e:
+            # A failed prediction is this request's error, not a malformed request; the connection stays open
+            raise HTTPError(500, f"Prediction failed: {e}")
+        return {"glucose": glucose, "model_version": self.model_version}
+
+    async def _route(self, method, target, body):
+        if target == "/predict":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            return 200, await self._predict(body)
+        if target in ("/health", "/stats"):
+            if method != "GET":
+                raise HTTPError(405, "Use GET")
+            if target == "/stats":
+                return 200, self.stats()
+            return (200 if self.ready else 503), self.health()
+        raise HTTPError(404, f"No route for {target}")
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while not self._closing:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise HTTPError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    status, reply = await self._route(method, target, body)
+                except HTTPError as e:
+                    status, reply = e.status, {"error": str(e)}
+                except ValueError:
+                    status, reply, keep_alive = 400, {"error": "Malformed request"}, False
+                except Exception as e:
+                    status, reply = 500, {"error": str(e)}
+
+                payload = json.dumps(reply).encode()
+                head = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: application/json",
+                        f"Content-Length: {len(payload)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if status == 503:
+                    head.append("Retry-After: 1")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+
+async def serve(args):
+    server = PredictionServer(args.model, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+                              queue_size=args.queue_size)
+    await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Glucose prediction server listening on {where} ({server.model_version})")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    print("Shutting down...")
+    await server.shutdown()
+    print(f"Served {server.requests_served} predictions in {server.batches} batches.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Glucose prediction server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="saved model artifact to load or create")
+    parser.add_argument("--max-batch", type=int, default=256, help="most requests per model call; 1 disables batching")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="longest a request waits for a batch to fill")
+    parser.add_argument("--queue-size", type=int, default=4096, help="pending requests before answering 503")
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from LLM import HealthFoodAdvisor
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snacks")
+
+
+class UserProfile:
+    """Compact per-user state, readable and writable like HealthFoodAdvisor.user_profile"""
+
+    __slots__ = ("name", "age", "weight_kg", "height_cm", "hba1c",
+                 "daily_calorie_target", "calories_consumed", "steps_today", "_meals")
+
+    FIELDS = __slots__[:-1]
+
+    def __init__(self, name="", age=0, weight_kg=0, height_cm=0, hba1c=0,
+                 daily_calorie_target=2000, calories_consumed=0, steps_today=0):
+        self.name = name
+        self.age = age
+        self.weight_kg = weight_kg
+        self.height_cm = height_cm
+        self.hba1c = hba1c
+        self.daily_calorie_target = daily_calorie_target
+        self.calories_consumed = calories_consumed
+        self.steps_today = steps_today
+        # Meal records are only allocated once a meal is logged or looked at
+        self._meals = None
+
+    @property
+    def meals(self):
+        if self._meals is None:
+            self._meals = {meal: {"foods": {}, "calories": 0} for meal in MEAL_TYPES}
+        return self._meals
+
+    def __getitem__(self, key):
+        if key == "meals":
+            return self.meals
+        if key in self.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == "meals":
+            self._meals = value
+        elif key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key == "meals" or key in self.FIELDS
+
+    def to_dict(self):
+        """Return the profile in HealthFoodAdvisor.user_profile's dict layout"""
+        profile = {field: getattr(self, field) for field in self.FIELDS}
+        profile["meals"] = self.meals
+        return profile
+
+
+class SessionStore:
+    """Many user profiles served by one shared HealthFoodAdvisor.
+
+    The food tables, matcher, nutrient matrix and parse cache exist once in
+    the shared advisor; each user costs only a UserProfile.
+    """
+
+    def __init__(self, advisor=None):
+        self.advisor = advisor if advisor is not None else HealthFoodAdvisor()
+        self.profiles = {}
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def __contains__(self, user_id):
+        return user_id in self.profiles
+
+    def get_profile(self, user_id):
+        """Return the user's profile, creating an empty one on first use"""
+        profile = self.profiles.get(user_id)
+        if profile is None:
+            profile = self.profiles[user_id] = UserProfile()
+        return profile
+
+    def remove(self, user_id):
+        """Drop a user's session state"""
+        self.profiles.pop(user_id, None)
+
+    def advisor_for(self, user_id):
+        """Return a short-lived advisor bound to the user's profile"""
+        return self.advisor.with_profile(self.get_profile(user_id), user_id)
+
+    def generate_response(self, user_id, user_input, parsed=None):
+        """Answer a chat message for one user"""
+        return self.advisor_for(user_id).generate_response(user_input, parsed)
@@ -0,0 +1,114 @@
+import json
+
+
+class AdvisorResponse:
+    """Structured reply from HealthFoodAdvisor.generate_response.
+
+    Text is only rendered when asked for (str(), render()), and to_dict()/
+    to_json() give programmatic callers the raw values without any formatting.
+    """
+
+    kind = "message"
+
+    def __init__(self):
+        self._text = None
+
+    def render(self):
+        """Plain-text reply for the CLI"""
+        if self._text is None:
+            self._text = self._render()
+        return self._text
+
+    def _render(self):
+        raise NotImplementedError
+
+    def __str__(self):
+        return self.render()
+
+    def to_dict(self):
+        raise NotImplementedError
+
+    def to_json(self):
+        """Compact JSON serialization of to_dict()"""
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+
+class MessageResponse(AdvisorResponse):
+    """A short reply: a glucose reading, a step update or a request for clarification"""
+
+    def __init__(self, kind, text, **data):
+        super().__init__()
+        self.kind = kind
+        self._text = text
+        self.data = data
+
+    def _render(self):
+        return self._text
+
+    def to_dict(self):
+        result = {"kind": self.kind, "message": self._text}
+        result.update(self.data)
+        return result
+
+
+class MealResponse(AdvisorResponse):
+    """A logged meal with its nutrition, the day's calorie budget, suggestions and follow-up questions"""
+
+    kind = "meal"
+
+    def __init__(self, meal_type, breakdown, totals, daily_calorie_target, calories_consumed,
+                 remaining_calories, health_suggestions, replacement_suggestions, follow_up_questions):
+        super().__init__()
+        self.meal_type = meal_type
+        self.breakdown = breakdown
+        self.totals = totals
+        self.daily_calorie_target = daily_calorie_target
+        self.calories_consumed = calories_consumed
+        self.remaining_calories = remaining_calories
+        self.health_suggestions = health_suggestions
+        self.replacement_suggestions = replacement_suggestions
+        self.follow_up_questions = follow_up_questions
+
+    def _render(self):
+        lines = [f"Okay, I've recorded your {self.meal_type}:", ""]
+        for food, info in self.breakdown.items():
+            lines.append(f"- {info['quantity']} serving(s) of {food}: {info['calories']} calories")
+
+        lines.append("")
+        lines.append(f"Total for this meal: {self.totals['calories']:.1f} calories")
+        lines.append(f"Daily calorie target: {self.daily_calorie_target:.1f}")
+        lines.append(f"Calories consumed today: {self.calories_consumed:.1f}")
+        lines.append(f"Remaining calories: {self.remaining_calories:.1f}")
+        lines.append("")
+
+        lines.append("Health suggestions:")
+        for i, suggestion in enumerate(self.health_suggestions, 1):
+            lines.append(f"{i}. {suggestion}")
+
+        if self.replacement_suggestions:
+            lines.append("")
+            lines.append("Meal improvement suggestions:")
+            for i, suggestion in enumerate(self.replacement_suggestions, 1):
+                lines.append(f"{i}. {suggestion}")
+
+        if self.follow_up_questions:
+            lines.append("")
+            lines.append("To give you better advice, I need to know about your previous meals:")
+            for question in self.follow_up_questions:
+                lines.append(f"- {question}")
+
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "meal_type": self.meal_type,
+            "breakdown": self.breakdown,
+            "totals": dict(self.totals),
+            "daily_calorie_target": self.daily_calorie_target,
+            "calories_consumed": self.calories_consumed,
+            "remaining_calories": self.remaining_calories,
+            "health_suggestions": self.health_suggestions,
+            "replacement_suggestions": self.replacement_suggestions,
+            "follow_up_questions": self.follow_up_questions,
+        }